@@ -0,0 +1,61 @@
+"""Micro-benchmark : détection des mots blacklistés, `any(word in content)` vs Aho-Corasick.
+
+Usage : python -m benchmarks.bench_blacklist
+"""
+import random
+import string
+import timeit
+
+from bot.blacklist_matcher import BlacklistMatcher, SMALL_SET_THRESHOLD
+
+ALPHABET = string.ascii_lowercase + "éèàç"
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 12)))
+
+
+def _messages(rng: random.Random, words: list[str], count: int) -> list[str]:
+    messages = []
+    for idx in range(count):
+        text = " ".join(_word(rng) for _ in range(rng.randint(3, 40)))
+        # ~5 % de messages contenant un terme blacklisté
+        if idx % 20 == 0:
+            text = f"{text} {rng.choice(words)} {_word(rng)}"
+        messages.append(text)
+    return messages
+
+
+def _legacy(words: set[str], content: str) -> bool:
+    return any(word in content for word in words)
+
+
+def main() -> None:
+    rng = random.Random(42)
+    print(f"(automate utilisé à partir de {SMALL_SET_THRESHOLD} termes)")
+    for size in (10, 1_000, 10_000):
+        words = {_word(rng) for _ in range(size)}
+        messages = _messages(rng, sorted(words), 2_000)
+        matcher = BlacklistMatcher(words)
+        for content in messages:
+            assert _legacy(words, content) == (matcher.find(content) is not None), content
+
+        # Le mode compilé forcé montre le coût de l'automate même sur de petits ensembles.
+        automaton = BlacklistMatcher(words)
+        if automaton.size < SMALL_SET_THRESHOLD:
+            automaton._words = None
+            automaton._build(list(words))
+
+        build = min(timeit.repeat(lambda: BlacklistMatcher(words), number=1, repeat=3))
+        legacy = min(timeit.repeat(lambda: [_legacy(words, m) for m in messages], number=1, repeat=3))
+        matched = min(timeit.repeat(lambda: [matcher.find(m) for m in messages], number=1, repeat=3))
+        compiled = min(timeit.repeat(lambda: [automaton.find(m) for m in messages], number=1, repeat=3))
+        n = len(messages)
+        print(f"{len(words):>6} mots, {n} messages (résultats identiques), compilation {build * 1e3:.1f} ms")
+        print(f"  any(word in content) : {legacy / n * 1e6:10.2f} µs/message")
+        print(f"  BlacklistMatcher     : {matched / n * 1e6:10.2f} µs/message  (x{legacy / matched:,.1f})")
+        print(f"  automate seul        : {compiled / n * 1e6:10.2f} µs/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Benchmark : cartes XP / LevelUp animées, rendu historique par frame vs calque précomposé.
+
+Le rendu historique (copié de card_generator avant le calque précomposé) redessine
+tout le premier plan sur chaque frame, avec des calques plein canevas et la barre
+en dégradé colonne par colonne. Mesure le temps réel (perf_counter) et le temps
+CPU du processus (process_time) par carte, avec et sans l'encodage GIF.
+
+Usage : python -m benchmarks.bench_cards
+"""
+import time
+from typing import Callable, Optional
+
+from PIL import Image, ImageChops, ImageDraw
+
+from bot import card_generator as cg
+from bot.card_generator import (
+    GLASS,
+    GLASS_BD,
+    GOLD,
+    LU_H,
+    LU_W,
+    NEON,
+    TEXT_MUT,
+    TEXT_PRI,
+    TEXT_SEC,
+    VIOLET,
+    XP_H,
+    XP_W,
+    _font,
+    _font_sekuya,
+)
+
+ROUNDS = 10
+
+
+# ── Implémentation historique (card_generator avant le calque précomposé) ────
+def _legacy_rounded_rect_mask(w: int, h: int, r: int) -> Image.Image:
+    mask = Image.new("L", (w, h), 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, w, h), radius=r, fill=255)
+    return mask
+
+
+def _legacy_glass_panel(canvas: Image.Image, x: int, y: int, w: int, h: int, r: int = 18) -> None:
+    panel = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(panel)
+    draw.rounded_rectangle(
+        (x, y, x + w, y + h),
+        radius=r,
+        fill=GLASS,
+        outline=GLASS_BD,
+        width=1
+    )
+    canvas.alpha_composite(panel)
+
+
+def _legacy_draw_xp_bar(canvas: Image.Image, x: int, y: int, w: int, h: int, progress: float, pct_label: bool = True) -> None:
+    """Barre de XP avec pourcentage — sans glow circle."""
+    r = h // 2
+    prog = max(0.0, min(1.0, progress))
+
+    # Fond de la barre
+    bg = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    bg_mask = _legacy_rounded_rect_mask(w, h, r)
+    bg.paste(Image.new("RGBA", (w, h), (255, 255, 255, 22)), (x, y), bg_mask)
+    canvas.alpha_composite(bg)
+
+    # Barre de progression (dégradé violet → cyan)
+    fill_w = max(r * 2, int(w * prog))
+    bar = Image.new("RGBA", (fill_w, h), (0, 0, 0, 0))
+    for px in range(fill_w):
+        t = px / max(fill_w - 1, 1)
+        rc = int(VIOLET[0] + (NEON[0] - VIOLET[0]) * t)
+        gc = int(VIOLET[1] + (NEON[1] - VIOLET[1]) * t)
+        bc = int(VIOLET[2] + (NEON[2] - VIOLET[2]) * t)
+        ImageDraw.Draw(bar).line([(px, 0), (px, h)], fill=(rc, gc, bc, 255))
+    filled = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    filled.paste(bar, (x, y), _legacy_rounded_rect_mask(fill_w, h, r))
+    canvas.alpha_composite(filled)
+
+    # Label % (pas de glow circle)
+    if pct_label:
+        pct_txt = f"{int(prog * 100)}%"
+        f_pct = _font(11, bold=True)
+        draw = ImageDraw.Draw(canvas)
+        bbox = draw.textbbox((0, 0), pct_txt, font=f_pct)
+        tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        tx = x + w - tw - 6
+        ty = y + (h - th) // 2
+        draw.text((tx + 1, ty + 1), pct_txt, font=f_pct, fill=(0, 0, 0, 200))
+        draw.text((tx, ty), pct_txt, font=f_pct, fill=TEXT_PRI)
+
+
+def _legacy_avatar_with_ring(canvas: Image.Image, avatar: Optional[Image.Image], cx: int, cy: int, av_size: int) -> None:
+    """Avatar avec anneau lumineux."""
+    ring_r = av_size // 2 + 3
+    ring = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    d = ImageDraw.Draw(ring)
+    for i in range(8, 0, -1):
+        d.ellipse(
+            (cx - ring_r - i, cy - ring_r - i, cx + ring_r + i, cy + ring_r + i),
+            outline=(*NEON, int(35 * i / 8)),
+            width=1
+        )
+    d.ellipse(
+        (cx - ring_r, cy - ring_r, cx + ring_r, cy + ring_r),
+        outline=(*NEON, 220),
+        width=2
+    )
+    canvas.alpha_composite(ring)
+
+    if avatar:
+        canvas.paste(avatar, (cx - av_size // 2, cy - av_size // 2), avatar)
+    else:
+        ph = Image.new("RGBA", (av_size, av_size), (30, 40, 80, 255))
+        mask = _legacy_rounded_rect_mask(av_size, av_size, av_size // 2)
+        ph_l = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+        ph_l.paste(ph, (cx - av_size // 2, cy - av_size // 2), mask)
+        canvas.alpha_composite(ph_l)
+
+
+def _legacy_level_badge(canvas: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int, level: int) -> None:
+    label = f"LVL {level}"
+    f = _font(13, bold=True)
+    bbox = draw.textbbox((0, 0), label, font=f)
+    tw = bbox[2] - bbox[0]
+    bw, bh = tw + 22, 22
+    badge = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    ImageDraw.Draw(badge).rounded_rectangle(
+        (x, y, x + bw, y + bh),
+        radius=bh // 2,
+        fill=(*NEON, 28),
+        outline=(*NEON, 110),
+        width=1
+    )
+    canvas.alpha_composite(badge)
+    draw.text((x + 11, y + 4), label, font=f, fill=NEON)
+
+
+def _legacy_rank_badge(canvas: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int, rank_text: str) -> None:
+    """Badge de classement (#X/Y) dans la carte XP."""
+    f = _font(12, bold=True)
+    bbox = draw.textbbox((0, 0), rank_text, font=f)
+    tw = bbox[2] - bbox[0]
+    bw, bh = tw + 18, 20
+    badge = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    ImageDraw.Draw(badge).rounded_rectangle(
+        (x, y, x + bw, y + bh),
+        radius=bh // 2,
+        fill=(255, 210, 60, 30),
+        outline=(255, 210, 60, 100),
+        width=1
+    )
+    canvas.alpha_composite(badge)
+    draw.text((x + 9, y + 3), rank_text, font=f, fill=GOLD)
+
+
+def _legacy_build_xp_frame(
+    template: Image.Image,
+    name: str,
+    avatar: Optional[Image.Image],
+    level: int,
+    xp_progress: int,
+    xp_required: int,
+    xp_total: int,
+    rank: Optional[int] = None,
+    total_members: Optional[int] = None,
+) -> Image.Image:
+    """Frame pour la carte XP avec classement."""
+    canvas = template.copy()
+    PAD = 16
+    _legacy_glass_panel(canvas, PAD, PAD, XP_W - PAD * 2, XP_H - PAD * 2, r=20)
+
+    AV = 100
+    CX = PAD + 20 + AV // 2
+    CY = XP_H // 2
+    _legacy_avatar_with_ring(canvas, avatar, CX, CY, AV)
+
+    draw = ImageDraw.Draw(canvas)
+    TX = CX + AV // 2 + 24
+
+    # Nom (NotoSans Bold)
+    f_name = _font(24, bold=True)
+    name_s = name[:22] + ("…" if len(name) > 22 else "")
+    draw.text((TX, PAD + 12), name_s, font=f_name, fill=TEXT_PRI)
+
+    # Badge LVL
+    bbox = draw.textbbox((TX, PAD + 12), name_s, font=f_name)
+    _legacy_level_badge(canvas, draw, bbox[2] + 8, PAD + 16, level)
+
+    # XP info
+    draw.text((TX, PAD + 44), f"{xp_progress:,} / {xp_required:,} XP", font=_font(14), fill=TEXT_SEC)
+
+    # Barre XP (sans glow circle)
+    BAR_X = TX
+    BAR_Y = PAD + 72
+    BAR_W = XP_W - PAD - 20 - TX
+    ratio = xp_progress / xp_required if xp_required > 0 else 1.0
+    _legacy_draw_xp_bar(canvas, BAR_X, BAR_Y, BAR_W, 14, ratio, True)
+
+    # Total XP + classement sur la même ligne
+    bottom_y = BAR_Y + 22
+    total_txt = f"Total : {xp_total:,} XP"
+    draw.text((TX, bottom_y), total_txt, font=_font(12), fill=TEXT_MUT)
+
+    # Classement à droite
+    if rank is not None:
+        rank_txt = f"#{rank}" if total_members is None else f"#{rank}/{total_members}"
+        _legacy_rank_badge(canvas, draw, XP_W - PAD - 20 - 80, bottom_y - 2, rank_txt)
+
+    # Séparateur vertical
+    line = Image.new("RGBA", (XP_W, XP_H), (0, 0, 0, 0))
+    ImageDraw.Draw(line).rectangle(
+        (PAD + AV + 36, PAD + 24, PAD + AV + 37, XP_H - PAD - 24),
+        fill=(*NEON, 40)
+    )
+    canvas.alpha_composite(line)
+    return canvas
+
+
+def _legacy_build_levelup_frame(
+    template: Image.Image,
+    name: str,
+    avatar: Optional[Image.Image],
+    old_level: int,
+    new_level: int,
+    xp_progress: int,
+    xp_required: int,
+) -> Image.Image:
+    """Frame pour la carte LevelUp — titre en Sekuya."""
+    canvas = template.copy()
+    PAD = 16
+    _legacy_glass_panel(canvas, PAD, PAD, LU_W - PAD * 2, LU_H - PAD * 2, r=20)
+
+    AV = 100
+    CX = PAD + 20 + AV // 2
+    CY = LU_H // 2
+    _legacy_avatar_with_ring(canvas, avatar, CX, CY, AV)
+
+    draw = ImageDraw.Draw(canvas)
+    TX = CX + AV // 2 + 28
+
+    # "LEVEL UP !" en Sekuya
+    draw.text((TX, PAD + 8), "LEVEL UP !", font=_font_sekuya(30), fill=GOLD)
+
+    name_s = name[:22] + ("…" if len(name) > 22 else "")
+    draw.text((TX, PAD + 46), name_s, font=_font(20, bold=True), fill=TEXT_PRI)
+    draw.text((TX, PAD + 72), f"Niveau {old_level} → {new_level}", font=_font(16), fill=TEXT_SEC)
+
+    # Barre XP (sans glow circle)
+    BAR_X = TX
+    BAR_Y = PAD + 100
+    BAR_W = LU_W - PAD - 20 - TX
+    ratio = xp_progress / xp_required if xp_required > 0 else 1.0
+    _legacy_draw_xp_bar(canvas, BAR_X, BAR_Y, BAR_W, 14, ratio, True)
+
+    draw.text((TX, BAR_Y + 22), f"{xp_progress:,} / {xp_required:,} XP", font=_font(12), fill=TEXT_SEC)
+    return canvas
+
+
+def _avatar(size: int) -> Image.Image:
+    img = Image.effect_mandelbrot((size, size), (-2.0, -1.5, 1.0, 1.5), 64).convert("RGBA")
+    out = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    out.paste(img, mask=cg._rounded_rect_mask(size, size, size // 2))
+    return out
+
+
+def _measure(fn: Callable[[], object]) -> tuple[float, float]:
+    fn()  # chauffe (polices, fonds)
+    wall = cpu = 0.0
+    for _ in range(ROUNDS):
+        w0, c0 = time.perf_counter(), time.process_time()
+        fn()
+        wall += time.perf_counter() - w0
+        cpu += time.process_time() - c0
+    return wall / ROUNDS, cpu / ROUNDS
+
+
+def _report(label: str, legacy: tuple[float, float], current: tuple[float, float]) -> None:
+    print(f"  {label}")
+    print(f"    historique  : {legacy[0] * 1e3:8.1f} ms réel  {legacy[1] * 1e3:8.1f} ms CPU")
+    print(f"    calque      : {current[0] * 1e3:8.1f} ms réel  {current[1] * 1e3:8.1f} ms CPU")
+    print(
+        f"    gain        : {(legacy[0] - current[0]) * 1e3:8.1f} ms réel  "
+        f"{(legacy[1] - current[1]) * 1e3:8.1f} ms CPU  (x{legacy[0] / current[0]:.1f})"
+    )
+
+
+def main() -> None:
+    avatar = _avatar(100)
+    cards = [
+        (
+            "XP",
+            XP_W,
+            XP_H,
+            _legacy_build_xp_frame,
+            cg._build_xp_overlay,
+            ("Utilisateur", avatar, 42, 1_234, 5_000, 98_765, 3, 1_200),
+        ),
+        (
+            "LevelUp",
+            LU_W,
+            LU_H,
+            _legacy_build_levelup_frame,
+            cg._build_levelup_overlay,
+            ("Utilisateur", avatar, 41, 42, 120, 5_000),
+        ),
+    ]
+    for name, w, h, build_frame, build_overlay, args in cards:
+        templates, duration = cg._load_bg_frames(w, h, cg.MAX_XP_FRAMES)
+
+        def legacy() -> list:
+            return [build_frame(t, *args) for t in templates]
+
+        def overlay() -> list:
+            return cg._compose_frames(templates, build_overlay(*args))
+
+        drift = max(
+            max(hi for _, hi in ImageChops.difference(a, b).getextrema())
+            for a, b in zip(legacy(), overlay())
+        )
+        print(f"Carte {name} : {len(templates)} frames {w}x{h}, écart max par canal {drift}")
+        _report("composition", _measure(legacy), _measure(overlay))
+        _report(
+            "composition + GIF",
+            _measure(lambda: cg._encode_output(legacy(), duration)),
+            _measure(lambda: cg._encode_output(overlay(), duration)),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Micro-benchmark : conversion XP → niveau, boucle historique vs table + bisect.
+
+Usage : python -m benchmarks.bench_level_curve
+"""
+import random
+import timeit
+
+from bot.level_curve import (
+    MAX_LEVEL,
+    MAX_XP,
+    XP_BASE_BY_LEVEL,
+    XP_GROWTH_FACTOR,
+    xp_in_current_level,
+    xp_to_level,
+)
+
+
+# ── Implémentation historique (main.py avant la table de seuils) ─────────────
+def _legacy_required(level: int) -> int:
+    if level < 0:
+        return XP_BASE_BY_LEVEL
+    return int(XP_BASE_BY_LEVEL * (XP_GROWTH_FACTOR ** level))
+
+
+def _legacy_total(level: int) -> int:
+    if level <= 0:
+        return 0
+    return sum(_legacy_required(lvl) for lvl in range(level))
+
+
+def _legacy_to_level(xp: int) -> int:
+    if xp <= 0:
+        return 0
+    level = 0
+    while level < MAX_LEVEL and xp >= _legacy_total(level + 1):
+        level += 1
+    return level
+
+
+def _legacy_in_current_level(xp: int) -> tuple[int, int]:
+    level = _legacy_to_level(xp)
+    if level >= MAX_LEVEL:
+        req = _legacy_required(MAX_LEVEL - 1)
+        return req, req
+    return max(0, xp - _legacy_total(level)), _legacy_required(level)
+
+
+def main() -> None:
+    rng = random.Random(42)
+    samples = [rng.randint(-10, MAX_XP + 10_000) for _ in range(2_000)]
+    samples += [rng.randint(0, 50_000) for _ in range(2_000)]
+
+    for xp in samples:
+        assert xp_to_level(xp) == _legacy_to_level(xp), xp
+        assert xp_in_current_level(xp) == _legacy_in_current_level(xp), xp
+
+    runs = 3
+    legacy = min(timeit.repeat(lambda: [_legacy_to_level(xp) for xp in samples], number=1, repeat=runs))
+    table = min(timeit.repeat(lambda: [xp_to_level(xp) for xp in samples], number=1, repeat=runs))
+    n = len(samples)
+    print(f"{n} conversions XP → niveau (résultats identiques)")
+    print(f"  boucle historique : {legacy / n * 1e6:9.2f} µs/conversion")
+    print(f"  table + bisect    : {table / n * 1e6:9.2f} µs/conversion  (x{legacy / table:,.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,61 @@
+import asyncio
 import datetime
-from collections import defaultdict
-from typing import Any
+import time
+from collections import defaultdict, deque
+from typing import Any, Optional
 
 import discord
 from discord import AuditLogAction
 
+from bot.policies import NukePolicy
 from bot.trust_levels import is_trusted
 
 
+AUDIT_BUFFER_SIZE = 100  # entrées d'audit récentes gardées par serveur
+AUDIT_WAIT_SECONDS = 2.0  # l'entrée d'audit arrive souvent juste après l'événement
+IDLE_SWEEP_INTERVAL = 300  # secondes entre deux purges des exécuteurs inactifs
+
+
 class AntiNuke:
     def __init__(self, bot: discord.Client, config: dict[str, Any]):
         self.bot = bot
-        self.action_buckets: dict[int, dict[int, dict[str, list[datetime.datetime]]]] = defaultdict(
-            lambda: defaultdict(lambda: defaultdict(list))
+        # { guild_id: { executor_id: { action: deque[horodatage monotone] } } }
+        self.action_buckets: dict[int, dict[int, dict[str, deque[float]]]] = {}
+        self._last_sweep = time.monotonic()
+        self.evicted_executors = 0
+        # Entrées reçues via `on_audit_log_entry_create`, plus récentes à droite
+        self.audit_entries: dict[int, deque[discord.AuditLogEntry]] = defaultdict(
+            lambda: deque(maxlen=AUDIT_BUFFER_SIZE)
         )
+        self._audit_signals: dict[int, asyncio.Event] = {}
+        self._audit_fetches: dict[tuple[int, AuditLogAction], asyncio.Task] = {}
+        self.audit_buffer_hits = 0
+        self.audit_fetches = 0
         self.update_config(config)
 
     def update_config(self, config: dict[str, Any]) -> None:
         self.config = (config or {}).get('nuke', {})
+        self.policy = NukePolicy.from_config(self.config)
+
+    def record_audit_entry(self, entry: discord.AuditLogEntry) -> None:
+        """À brancher sur `on_audit_log_entry_create` : alimente le tampon du serveur."""
+        guild_id = entry.guild.id
+        buffer = self.audit_entries[guild_id]
+        if any(existing.id == entry.id for existing in buffer):
+            return
+        buffer.append(entry)
+        signal = self._audit_signals.pop(guild_id, None)
+        if signal is not None:
+            signal.set()
 
     async def handle_channel_delete(self, channel: discord.abc.GuildChannel):
-        await self._handle_event(channel.guild, 'channel_delete', AuditLogAction.channel_delete)
+        await self._handle_event(channel.guild, 'channel_delete', AuditLogAction.channel_delete, channel.id)
 
     async def handle_role_delete(self, role: discord.Role):
-        await self._handle_event(role.guild, 'role_delete', AuditLogAction.role_delete)
+        await self._handle_event(role.guild, 'role_delete', AuditLogAction.role_delete, role.id)
 
-    async def handle_ban(self, guild: discord.Guild):
-        await self._handle_event(guild, 'ban', AuditLogAction.ban)
+    async def handle_ban(self, guild: discord.Guild, user: Optional[discord.abc.User] = None):
+        await self._handle_event(guild, 'ban', AuditLogAction.ban, user.id if user else None)
 
     async def handle_webhook_create(self, channel: discord.abc.GuildChannel):
         await self._handle_event(channel.guild, 'webhook', AuditLogAction.webhook_create)
@@ -34,49 +63,37 @@ class AntiNuke:
     async def handle_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
         if before.permissions_synced == after.permissions_synced and before.overwrites == after.overwrites:
             return
-        await self._handle_event(after.guild, 'channel_update', AuditLogAction.overwrite_update)
-
-    async def _handle_event(self, guild: discord.Guild, action_type: str, audit_action):
-        conf = self.config or {}
-        time_window = self._to_int(conf.get('timeWindow') or conf.get('time_window'), 30)
-        audit_log_max_age = self._to_int(conf.get('auditLogMaxAge'), 15)
-        threshold_map = {
-            'channel_delete': self._to_int(conf.get('channelDeleteLimit'), 3),
-            'role_delete': self._to_int(conf.get('roleDeleteLimit'), 5),
-            'ban': self._to_int(conf.get('banLimit'), 10),
-            'webhook': self._to_int(conf.get('webhookCreateLimit'), 3),
-            'channel_update': self._to_int(conf.get('channelUpdateLimit', conf.get('channelDeleteLimit')), 3),
-        }
-        try:
-            async for entry in guild.audit_logs(limit=3, action=audit_action):
-                executor = entry.user
-                if executor and self._is_recent_audit_entry(entry, audit_log_max_age):
-                    break
-            else:
-                return
-        except Exception:
+        await self._handle_event(after.guild, 'channel_update', AuditLogAction.overwrite_update, after.id)
+
+    async def _handle_event(
+        self,
+        guild: discord.Guild,
+        action_type: str,
+        audit_action: AuditLogAction,
+        target_id: Optional[int] = None,
+    ):
+        policy = self.policy
+        entry = await self._find_audit_entry(guild, audit_action, target_id, policy.audit_log_max_age)
+        if entry is None:
             return
+        executor = await self._resolve_executor(guild, entry)
         if executor is None:
             return
         if self.bot.user and executor.id == self.bot.user.id:
             return
 
         is_bot_executor = bool(getattr(executor, 'bot', False))
-        protect_bots = bool(conf.get('protectBots', True))
-        if not is_bot_executor or not protect_bots:
-            if is_trusted(str(executor.id), guild, allow_owner=conf.get('allowOwner', True)):
+        if not is_bot_executor or not policy.protect_bots:
+            if await is_trusted(str(executor.id), guild, allow_owner=policy.allow_owner):
                 return
 
-        now = datetime.datetime.utcnow()
-        threshold = threshold_map.get(action_type)
-        if is_bot_executor and protect_bots:
-            threshold = min(threshold or 1, self._to_int(conf.get('botActionLimit'), 1))
-
-        action_count = self._bump_bucket(guild.id, executor.id, action_type, now, time_window)
-        global_count = self._bump_bucket(guild.id, executor.id, '__global__', now, time_window)
-        global_threshold = self._to_int(conf.get('globalActionLimit'), 4)
-        if is_bot_executor and protect_bots:
-            global_threshold = min(global_threshold, self._to_int(conf.get('botActionLimit'), 1))
+        now = time.monotonic()
+        if now - self._last_sweep >= IDLE_SWEEP_INTERVAL:
+            self.sweep_idle(now)
+        threshold = policy.threshold_for(action_type, is_bot_executor)
+        action_count = self._bump_bucket(guild.id, executor.id, action_type, now, policy.time_window)
+        global_count = self._bump_bucket(guild.id, executor.id, '__global__', now, policy.time_window)
+        global_threshold = policy.global_threshold_for(is_bot_executor)
 
         if (threshold and action_count >= threshold) or (global_threshold and global_count >= global_threshold):
             member = guild.get_member(executor.id)
@@ -87,28 +104,133 @@ class AntiNuke:
                     member = None
             if member:
                 await self._apply_punishment(guild, member, bot_executor=is_bot_executor)
-            self.action_buckets[guild.id][executor.id].clear()
+            self.action_buckets.get(guild.id, {}).pop(executor.id, None)
 
     def _bump_bucket(
         self,
         guild_id: int,
         executor_id: int,
         action_type: str,
-        now: datetime.datetime,
+        now: float,
         time_window: int,
     ) -> int:
-        bucket = self.action_buckets[guild_id][executor_id][action_type]
+        executor_buckets = self.action_buckets.setdefault(guild_id, {}).setdefault(executor_id, {})
+        bucket = executor_buckets.get(action_type)
+        if bucket is None:
+            bucket = executor_buckets[action_type] = deque()
         bucket.append(now)
-        fresh = [ts for ts in bucket if (now - ts).total_seconds() <= time_window]
-        self.action_buckets[guild_id][executor_id][action_type] = fresh
-        return len(fresh)
+        cutoff = now - time_window
+        while bucket[0] < cutoff:
+            bucket.popleft()
+        return len(bucket)
 
-    @staticmethod
-    def _to_int(value: Any, fallback: int) -> int:
+    def sweep_idle(self, now: Optional[float] = None) -> int:
+        """Oublie les exécuteurs sans action dans la fenêtre et les serveurs vidés."""
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        cutoff = now - self.policy.time_window
+        evicted = 0
+        for guild_id in list(self.action_buckets):
+            guild_buckets = self.action_buckets[guild_id]
+            for executor_id in list(guild_buckets):
+                if all(not bucket or bucket[-1] < cutoff for bucket in guild_buckets[executor_id].values()):
+                    del guild_buckets[executor_id]
+                    evicted += 1
+            if not guild_buckets:
+                del self.action_buckets[guild_id]
+        for guild_id in list(self.audit_entries):
+            buffer = self.audit_entries[guild_id]
+            if not buffer or not self._is_recent_audit_entry(buffer[-1], self.policy.audit_log_max_age):
+                del self.audit_entries[guild_id]
+        self.evicted_executors += evicted
+        return evicted
+
+    def tracked_executors(self) -> int:
+        return sum(len(guild_buckets) for guild_buckets in self.action_buckets.values())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "guilds": len(self.action_buckets),
+            "tracked_executors": self.tracked_executors(),
+            "evicted_executors": self.evicted_executors,
+            "audit_buffers": len(self.audit_entries),
+            "audit_buffer_hits": self.audit_buffer_hits,
+            "audit_fetches": self.audit_fetches,
+        }
+
+    async def _find_audit_entry(
+        self,
+        guild: discord.Guild,
+        audit_action: AuditLogAction,
+        target_id: Optional[int],
+        max_age: int,
+    ) -> Optional[discord.AuditLogEntry]:
+        """Cherche l'entrée d'audit dans le tampon (en attendant brièvement la passerelle),
+        puis en dernier recours via un seul appel REST partagé par toute la rafale."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + AUDIT_WAIT_SECONDS
+        while True:
+            entry = self._match_buffered(guild.id, audit_action, target_id, max_age)
+            if entry is not None:
+                self.audit_buffer_hits += 1
+                return entry
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            signal = self._audit_signals.setdefault(guild.id, asyncio.Event())
+            try:
+                await asyncio.wait_for(signal.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+
+        key = (guild.id, audit_action)
+        task = self._audit_fetches.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_audit_entries(guild, audit_action))
+            self._audit_fetches[key] = task
+            task.add_done_callback(lambda _: self._audit_fetches.pop(key, None))
+        await asyncio.shield(task)
+        return self._match_buffered(guild.id, audit_action, target_id, max_age)
+
+    async def _fetch_audit_entries(self, guild: discord.Guild, audit_action: AuditLogAction) -> None:
+        self.audit_fetches += 1
         try:
-            return int(value)
-        except (TypeError, ValueError):
-            return fallback
+            entries = [entry async for entry in guild.audit_logs(limit=10, action=audit_action)]
+        except Exception:
+            return
+        for entry in reversed(entries):
+            self.record_audit_entry(entry)
+
+    def _match_buffered(
+        self,
+        guild_id: int,
+        audit_action: AuditLogAction,
+        target_id: Optional[int],
+        max_age: int,
+    ) -> Optional[discord.AuditLogEntry]:
+        buffer = self.audit_entries.get(guild_id)
+        if not buffer:
+            return None
+        for entry in reversed(buffer):
+            if entry.action != audit_action or entry.user_id is None:
+                continue
+            if not self._is_recent_audit_entry(entry, max_age):
+                continue
+            if target_id is not None and getattr(entry.target, 'id', None) != target_id:
+                continue
+            return entry
+        return None
+
+    async def _resolve_executor(
+        self, guild: discord.Guild, entry: discord.AuditLogEntry
+    ) -> Optional[discord.abc.User]:
+        executor = entry.user or guild.get_member(entry.user_id) or self.bot.get_user(entry.user_id)
+        if executor is None:
+            try:
+                executor = await self.bot.fetch_user(entry.user_id)
+            except Exception:
+                return None
+        return executor
 
     @staticmethod
     def _is_recent_audit_entry(entry: discord.AuditLogEntry, max_age_seconds: int) -> bool:
@@ -120,9 +242,7 @@ class AntiNuke:
         return (datetime.datetime.utcnow() - created_at).total_seconds() <= max_age_seconds
 
     async def _apply_punishment(self, guild: discord.Guild, executor: discord.Member, bot_executor: bool = False):
-        action = (self.config or {}).get('punitiveAction', 'strip')
-        if bot_executor:
-            action = (self.config or {}).get('botPunitiveAction', 'ban')
+        action = self.policy.bot_punitive_action if bot_executor else self.policy.punitive_action
 
         if action == 'ban':
             try:
@@ -1,59 +1,194 @@
+import asyncio
 import datetime
+import heapq
+import itertools
+import logging
+import os
+import time
 from collections import defaultdict
-from typing import Any
+from typing import Any, Awaitable, Callable, Optional
 
 import discord
 
+from bot.policies import RaidPolicy
 from bot.trust_levels import is_trusted
 
+logger = logging.getLogger(__name__)
+
+# Requêtes set_permissions simultanées ; discord.py gère ensuite les buckets de rate limit par route.
+LOCKDOWN_CONCURRENCY = max(1, int(os.getenv("LOCKDOWN_CONCURRENCY", "5")))
+LOCKDOWN_PROGRESS_EVERY = 25
+# Workers par serveur pour les expulsions / quarantaines pendant un raid
+RAID_ACTION_WORKERS = max(1, int(os.getenv("RAID_ACTION_WORKERS", "3")))
+RAID_PROGRESS_EVERY = 50
+
 
 class AntiRaid:
     def __init__(self, bot: discord.Client, config: dict[str, Any]):
         self.bot = bot
         self.join_buckets: dict[int, list[datetime.datetime]] = defaultdict(list)
         self.lockdown_state: dict[int, list[tuple[int, dict[str, discord.PermissionOverwrite]]]] = {}
+        # { guild_id: { action: {"channels", "failed", "seconds"} } } — "seconds" = temps jusqu'au dernier salon traité
+        self.lockdown_metrics: dict[int, dict[str, dict[str, Any]]] = {}
+        # File d'actions par serveur : tas de (-création du compte, seq, membre, action, rôle)
+        self._action_heaps: dict[int, list[tuple]] = defaultdict(list)
+        self._queued_actions: dict[int, set[tuple[int, str]]] = defaultdict(set)
+        self._action_workers: dict[int, set[asyncio.Task]] = defaultdict(set)
+        self._action_seq = itertools.count()
+        self.action_stats: dict[int, dict[str, Any]] = {}
         self.update_config(config)
 
     def update_config(self, config: dict[str, Any]) -> None:
         self.config = (config or {}).get('raid', {})
+        self.policy = RaidPolicy.from_config(self.config)
 
-    def handle_member_join(self, member: discord.Member):
-        if is_trusted(str(member.id), member.guild):
+    async def handle_member_join(self, member: discord.Member):
+        if await is_trusted(str(member.id), member.guild):
             return
-        conf = self.config or {}
+        policy = self.policy
         now = datetime.datetime.utcnow()
         bucket = self.join_buckets[member.guild.id]
         bucket.append(now)
         cutoff = now - datetime.timedelta(seconds=60)
         self.join_buckets[member.guild.id] = [ts for ts in bucket if ts >= cutoff]
-        if len(self.join_buckets[member.guild.id]) >= conf.get('joinThreshold', 10):
-            if conf.get('lockdownOnRaid', True):
+        if len(self.join_buckets[member.guild.id]) >= policy.join_threshold:
+            if policy.lockdown_on_raid:
                 self.bot.loop.create_task(self.enable_lockdown(member.guild, 'Raid detection'))
         account_age_days = (now - member.created_at.replace(tzinfo=None)).days
-        if account_age_days < conf.get('accountAgeDays', 7):
-            if conf.get('kickYoungAccounts', False):
-                self.bot.loop.create_task(member.kick(reason='Anti-raid: account too new'))
-            elif conf.get('quarantineRoleId'):
-                role = member.guild.get_role(int(conf['quarantineRoleId']))
+        if account_age_days < policy.account_age_days:
+            if policy.kick_young_accounts:
+                self._enqueue_action(member, 'kick')
+            elif policy.quarantine_role_id:
+                role = member.guild.get_role(policy.quarantine_role_id)
                 if role:
-                    self.bot.loop.create_task(member.add_roles(role, reason='Anti-raid quarantine'))
+                    self._enqueue_action(member, 'quarantine', role)
 
-    async def enable_lockdown(self, guild: discord.Guild, reason: str):
-        if guild.id in self.lockdown_state:
+    def _enqueue_action(self, member: discord.Member, action: str, role: Optional[discord.Role] = None) -> None:
+        guild_id = member.guild.id
+        stats = self.action_stats.get(guild_id)
+        if stats is None or (not self._action_heaps[guild_id] and not self._action_workers[guild_id]):
+            # Nouvelle rafale : les compteurs de débit repartent de zéro.
+            stats = self.action_stats[guild_id] = {
+                "enqueued": 0, "deduped": 0, "done": 0, "failed": 0, "started_at": time.monotonic(),
+            }
+        key = (member.id, action)
+        if key in self._queued_actions[guild_id]:
+            stats["deduped"] += 1
             return
-        self.lockdown_state[guild.id] = []
-        for channel in guild.text_channels:
-            overwrites = channel.overwrites_for(guild.default_role)
-            self.lockdown_state[guild.id].append((channel.id, {guild.default_role.id: overwrites}))
+        self._queued_actions[guild_id].add(key)
+        stats["enqueued"] += 1
+        # Les comptes les plus récents (les plus suspects) sont traités en premier.
+        priority = -member.created_at.timestamp()
+        heapq.heappush(self._action_heaps[guild_id], (priority, next(self._action_seq), member, action, role))
+        workers = self._action_workers[guild_id]
+        while len(workers) < min(RAID_ACTION_WORKERS, len(self._action_heaps[guild_id])):
+            task = self.bot.loop.create_task(self._drain_actions(member.guild))
+            workers.add(task)
+            task.add_done_callback(workers.discard)
+
+    async def _drain_actions(self, guild: discord.Guild) -> None:
+        heap = self._action_heaps[guild.id]
+        stats = self.action_stats[guild.id]
+        while heap:
+            _, _, member, action, role = heapq.heappop(heap)
             try:
-                await channel.set_permissions(guild.default_role, send_messages=False, reason=reason)
+                if action == 'kick':
+                    await member.kick(reason='Anti-raid: account too new')
+                else:
+                    await member.add_roles(role, reason='Anti-raid quarantine')
+                stats["done"] += 1
             except Exception:
-                continue
+                stats["failed"] += 1
+            finally:
+                self._queued_actions[guild.id].discard((member.id, action))
+            processed = stats["done"] + stats["failed"]
+            if processed % RAID_PROGRESS_EVERY == 0:
+                logger.info("Actions anti-raid %s : %s", guild.name, self.raid_queue_stats(guild.id))
+        # Retrait synchrone (sans await depuis le test du tas) : une action poussée
+        # juste après voit ce worker comme terminé et en relance un.
+        workers = self._action_workers[guild.id]
+        workers.discard(asyncio.current_task())
+        if not workers:
+            logger.info("File anti-raid vidée pour %s : %s", guild.name, self.raid_queue_stats(guild.id))
+
+    def raid_queue_stats(self, guild_id: int) -> dict[str, Any]:
+        stats = self.action_stats.get(guild_id) or {}
+        elapsed = time.monotonic() - stats.get("started_at", time.monotonic())
+        processed = stats.get("done", 0) + stats.get("failed", 0)
+        return {
+            "depth": len(self._action_heaps.get(guild_id) or ()),
+            "workers": len(self._action_workers.get(guild_id) or ()),
+            "enqueued": stats.get("enqueued", 0),
+            "deduped": stats.get("deduped", 0),
+            "done": stats.get("done", 0),
+            "failed": stats.get("failed", 0),
+            "per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    @staticmethod
+    def _lockdown_order(guild: discord.Guild) -> list[discord.TextChannel]:
+        """Salons publics d'abord, puis du plus récemment actif au moins actif."""
+        default_role = guild.default_role
+
+        def _key(channel: discord.TextChannel) -> tuple[bool, int]:
+            public = channel.permissions_for(default_role).view_channel
+            return (not public, -(channel.last_message_id or 0))
+
+        return sorted(guild.text_channels, key=_key)
+
+    async def _run_on_channels(
+        self,
+        guild: discord.Guild,
+        channels: list[discord.TextChannel],
+        apply: Callable[[discord.TextChannel], Awaitable[Any]],
+        action: str,
+    ) -> None:
+        semaphore = asyncio.Semaphore(LOCKDOWN_CONCURRENCY)
+        total = len(channels)
+        done = failed = 0
+        started = time.perf_counter()
+
+        async def _one(channel: discord.TextChannel) -> None:
+            nonlocal done, failed
+            async with semaphore:
+                try:
+                    await apply(channel)
+                except Exception:
+                    failed += 1
+            done += 1
+            if done % LOCKDOWN_PROGRESS_EVERY == 0 and done < total:
+                logger.info("%s %s : %d/%d salons", action, guild.name, done, total)
+
+        await asyncio.gather(*(_one(channel) for channel in channels))
+        elapsed = time.perf_counter() - started
+        self.lockdown_metrics.setdefault(guild.id, {})[action] = {
+            "channels": total,
+            "failed": failed,
+            "seconds": round(elapsed, 2),
+        }
+        logger.info("%s %s terminé : %d salons (%d échecs) en %.1f s", action, guild.name, total, failed, elapsed)
+
+    async def enable_lockdown(self, guild: discord.Guild, reason: str):
+        if guild.id in self.lockdown_state:
+            return
+        channels = self._lockdown_order(guild)
+        # L'état est capturé avant toute modification pour pouvoir tout restaurer.
+        self.lockdown_state[guild.id] = [
+            (channel.id, {guild.default_role.id: channel.overwrites_for(guild.default_role)})
+            for channel in channels
+        ]
+        await self._run_on_channels(
+            guild,
+            channels,
+            lambda channel: channel.set_permissions(guild.default_role, send_messages=False, reason=reason),
+            "Lockdown",
+        )
 
     async def disable_lockdown(self, guild: discord.Guild, reason: str):
         state = self.lockdown_state.get(guild.id)
         if not state:
             return
+        restores: list[tuple[discord.TextChannel, discord.PermissionOverwrite]] = []
         for channel_id, permissions in state:
             channel = guild.get_channel(channel_id)
             if not isinstance(channel, discord.TextChannel):
@@ -61,14 +196,20 @@ class AntiRaid:
             overwrite = permissions.get(guild.default_role.id)
             if overwrite is None:
                 continue
-            try:
-                await channel.set_permissions(guild.default_role, overwrite=overwrite, reason=reason)
-            except Exception:
-                continue
+            restores.append((channel, overwrite))
+        overwrites = {channel.id: overwrite for channel, overwrite in restores}
+        await self._run_on_channels(
+            guild,
+            [channel for channel, _ in restores],
+            lambda channel: channel.set_permissions(
+                guild.default_role, overwrite=overwrites[channel.id], reason=reason
+            ),
+            "Fin du lockdown",
+        )
         self.lockdown_state.pop(guild.id, None)
 
     async def handle_lockdown_command(self, interaction: discord.Interaction, enable: bool):
-        if not is_trusted(str(interaction.user.id), interaction.guild):
+        if not await is_trusted(str(interaction.user.id), interaction.guild):
             await interaction.response.send_message('Action non autorisée.', ephemeral=True)
             return
         if enable:
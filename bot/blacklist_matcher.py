@@ -0,0 +1,104 @@
+"""Détection des mots blacklistés par automate d'Aho-Corasick.
+
+Un automate est compilé par serveur et réutilisé tant que l'ensemble de mots
+n'a pas changé : un message est alors parcouru une seule fois, quel que soit
+le nombre de termes, au lieu d'un test ``word in content`` par mot.
+
+Le cache est indexé par le contenu de l'ensemble de mots (un ``frozenset``) :
+une modification sur place de ``bot.blacklist_words`` est donc détectée, même
+à taille constante.
+"""
+from collections import deque
+from typing import Collection, Iterable, Optional
+
+# En dessous de ce nombre de termes, les tests `in` (en C) restent plus rapides
+# que le parcours de l'automate en Python (cf. benchmarks/bench_blacklist.py).
+SMALL_SET_THRESHOLD = 64
+
+
+class BlacklistMatcher:
+    __slots__ = ("_goto", "_fail", "_out", "_words", "size")
+
+    def __init__(self, words: Iterable[str]) -> None:
+        words = list(dict.fromkeys(words))
+        self.size = len(words)
+        self._words: Optional[tuple[str, ...]] = tuple(words) if self.size < SMALL_SET_THRESHOLD else None
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[Optional[str]] = [None]
+        self._fail: list[int] = [0]
+        if self._words is None:
+            self._build(words)
+
+    def _build(self, words: list[str]) -> None:
+        goto, out = self._goto, self._out
+        for word in words:
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(None)
+                state = nxt
+            if out[state] is None:
+                out[state] = word
+
+        fail = self._fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                link = fail[state]
+                while link and ch not in goto[link]:
+                    link = fail[link]
+                fail[nxt] = goto[link].get(ch, 0)
+                # Un état hérite du terme reconnu par son suffixe le plus long.
+                if out[nxt] is None:
+                    out[nxt] = out[fail[nxt]]
+
+    def find(self, text: str) -> Optional[str]:
+        """Un terme blacklisté contenu dans ``text`` (le premier rencontré), sinon None."""
+        if self._words is not None:
+            return next((word for word in self._words if word in text), None)
+        goto, fail, out = self._goto, self._fail, self._out
+        if out[0] is not None:  # mot vide : `"" in text` est toujours vrai
+            return out[0]
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] is not None:
+                return out[state]
+        return None
+
+
+_matchers: dict[int, tuple[frozenset[str], BlacklistMatcher]] = {}
+
+
+def matcher_for(guild_id: int, words: Collection[str]) -> BlacklistMatcher:
+    """Automate du serveur, recompilé seulement si l'ensemble de mots a changé."""
+    key = frozenset(words)
+    cached = _matchers.get(guild_id)
+    if cached is None or cached[0] != key:
+        cached = (key, BlacklistMatcher(words))
+        _matchers[guild_id] = cached
+    return cached[1]
+
+
+def find_blacklisted(guild_id: int, words: Collection[str], text: str) -> Optional[str]:
+    if not words:
+        return None
+    return matcher_for(guild_id, words).find(text)
+
+
+def invalidate(guild_id: Optional[int] = None) -> None:
+    if guild_id is None:
+        _matchers.clear()
+    else:
+        _matchers.pop(guild_id, None)
+
+
+__all__ = ["BlacklistMatcher", "find_blacklisted", "invalidate", "matcher_for"]
@@ -10,22 +10,41 @@ card_generator.py — Refonte 2026 v5
 """
 
 import asyncio
+import hashlib
 import io
 import logging
+import multiprocessing
 import os
 import shutil
+import signal
+import time
 import urllib.request
-from functools import partial
+from urllib.parse import urlencode, urlparse, urlunparse
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 from PIL import Image, ImageDraw, ImageFont, ImageSequence
 
+from bot.level_curve import xp_to_level
+
 logger = logging.getLogger(__name__)
 
 # ========================= CONFIGURATION =========================
 MAX_XP_FRAMES = 18  # 18 frames pour /xp et LevelUp
+# Processus de rendu dédiés (0 = rendu dans le pool de threads par défaut)
+CARD_RENDER_WORKERS = max(0, int(os.getenv("CARD_RENDER_WORKERS", "2")))
+# Avatars : budget mémoire, durée de vie (succès / échec) et téléchargements simultanés
+AVATAR_CACHE_BYTES = max(0, int(os.getenv("AVATAR_CACHE_BYTES", str(8 * 1024 * 1024))))
+AVATAR_CACHE_TTL = int(os.getenv("AVATAR_CACHE_TTL", "3600"))
+AVATAR_NEGATIVE_TTL = int(os.getenv("AVATAR_NEGATIVE_TTL", "60"))
+AVATAR_FETCH_CONCURRENCY = max(1, int(os.getenv("AVATAR_FETCH_CONCURRENCY", "4")))
+# Budget mémoire du cache de cartes XP encodées (une carte fait ~400 Ko)
+CARD_CACHE_BYTES = max(0, int(os.getenv("CARD_CACHE_BYTES", str(32 * 1024 * 1024))))
 # ================================================================
 
 _ROOT = Path(__file__).parent.parent
@@ -49,6 +68,8 @@ _NOTO_BOLD_URL = "https://github.com/openmaptiles/fonts/raw/master/noto-sans/Not
 XP_W, XP_H = 680, 200
 LU_W, LU_H = 680, 200
 TOP_W, TOP_H = 680, 580
+XP_AVATAR_SIZE = 100
+TOP_AVATAR_SIZE = 32
 
 # ========================= PALETTE =========================
 OVERLAY_ALPHA = 210  # Overlay plus sombre pour éviter que la lune cache le pseudo
@@ -66,8 +87,15 @@ BRONZE = (220, 150, 80)
 # ========================= CACHES =========================
 _bg_cache: Dict[Tuple[int, int], Tuple[List[Image.Image], int]] = {}
 _topxp_template: Optional[Image.Image] = None
-_avatar_cache: Dict[Tuple[str, int], Optional[Image.Image]] = {}
+# (url, taille) → (expiration monotonic, octets RGBA ou None si échec) ; LRU borné en octets
+_avatar_cache: "OrderedDict[Tuple[str, int], Tuple[float, Optional[bytes]]]" = OrderedDict()
+_avatar_cache_bytes = 0
+_avatar_cache_counters = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0}
 _font_cache: Dict[Tuple[str, int], ImageFont.FreeTypeFont] = {}
+# Cartes XP encodées, indexées par leurs entrées de rendu (LRU borné en octets)
+_card_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_card_cache_bytes = 0
+_card_cache_counters = {"hits": 0, "misses": 0, "evictions": 0}
 _fonts_loaded = False
 
 
@@ -77,7 +105,10 @@ def _dl(url: str, dest: Path) -> bool:
         req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
         with urllib.request.urlopen(req, timeout=12) as response:
             data = response.read()
-        dest.write_bytes(data)
+        # Écriture atomique : un autre processus ne doit jamais lire une police à moitié écrite.
+        tmp = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
         return True
     except Exception as exc:
         logger.warning("Échec téléchargement police %s : %s", url, exc)
@@ -207,7 +238,9 @@ def _dark_overlay(canvas: Image.Image, alpha: int = OVERLAY_ALPHA) -> None:
     canvas.alpha_composite(overlay)
 
 
+@lru_cache(maxsize=64)
 def _rounded_rect_mask(w: int, h: int, r: int) -> Image.Image:
+    # Mis en cache : les appelants ne s'en servent que comme masque, sans le modifier.
     mask = Image.new("L", (w, h), 0)
     ImageDraw.Draw(mask).rounded_rectangle((0, 0, w, h), radius=r, fill=255)
     return mask
@@ -268,29 +301,54 @@ def _build_topxp_template() -> Image.Image:
 
 
 # ========================= DRAW FUNCTIONS =========================
+def _draw_text(canvas: Image.Image, xy: Tuple[int, int], text: str, font: ImageFont.FreeTypeFont, fill: Tuple[int, ...]) -> None:
+    """Texte composé (« over ») sur le canevas.
+
+    ``ImageDraw.text`` mélange mal l'encre avec un pixel semi-transparent ;
+    passer par un calque garde le même rendu que la carte soit dessinée sur
+    une frame opaque ou sur le calque de premier plan transparent.
+    """
+    layer = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    ImageDraw.Draw(layer).text(xy, text, font=font, fill=fill)
+    canvas.alpha_composite(layer)
+
+
+@lru_cache(maxsize=16)
+def _xp_bar_track(w: int, h: int, r: int) -> Image.Image:
+    track = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    track.paste(Image.new("RGBA", (w, h), (255, 255, 255, 22)), (0, 0), _rounded_rect_mask(w, h, r))
+    return track
+
+
+@lru_cache(maxsize=256)
+def _xp_bar_fill(fill_w: int, h: int, r: int) -> Image.Image:
+    """Partie remplie de la barre, déjà masquée (le dégradé s'étire sur ``fill_w``)."""
+    row = bytearray()
+    for px in range(fill_w):
+        t = px / max(fill_w - 1, 1)
+        row += bytes((
+            int(VIOLET[0] + (NEON[0] - VIOLET[0]) * t),
+            int(VIOLET[1] + (NEON[1] - VIOLET[1]) * t),
+            int(VIOLET[2] + (NEON[2] - VIOLET[2]) * t),
+            255,
+        ))
+    bar = Image.frombytes("RGBA", (fill_w, h), bytes(row) * h)
+    filled = Image.new("RGBA", (fill_w, h), (0, 0, 0, 0))
+    filled.paste(bar, (0, 0), _rounded_rect_mask(fill_w, h, r))
+    return filled
+
+
 def _draw_xp_bar(canvas: Image.Image, x: int, y: int, w: int, h: int, progress: float, pct_label: bool = True) -> None:
     """Barre de XP avec pourcentage — sans glow circle."""
     r = h // 2
     prog = max(0.0, min(1.0, progress))
 
     # Fond de la barre
-    bg = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
-    bg_mask = _rounded_rect_mask(w, h, r)
-    bg.paste(Image.new("RGBA", (w, h), (255, 255, 255, 22)), (x, y), bg_mask)
-    canvas.alpha_composite(bg)
+    canvas.alpha_composite(_xp_bar_track(w, h, r), dest=(x, y))
 
     # Barre de progression (dégradé violet → cyan)
     fill_w = max(r * 2, int(w * prog))
-    bar = Image.new("RGBA", (fill_w, h), (0, 0, 0, 0))
-    for px in range(fill_w):
-        t = px / max(fill_w - 1, 1)
-        rc = int(VIOLET[0] + (NEON[0] - VIOLET[0]) * t)
-        gc = int(VIOLET[1] + (NEON[1] - VIOLET[1]) * t)
-        bc = int(VIOLET[2] + (NEON[2] - VIOLET[2]) * t)
-        ImageDraw.Draw(bar).line([(px, 0), (px, h)], fill=(rc, gc, bc, 255))
-    filled = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
-    filled.paste(bar, (x, y), _rounded_rect_mask(fill_w, h, r))
-    canvas.alpha_composite(filled)
+    canvas.alpha_composite(_xp_bar_fill(fill_w, h, r), dest=(x, y))
 
     # Label % (pas de glow circle)
     if pct_label:
@@ -301,8 +359,8 @@ def _draw_xp_bar(canvas: Image.Image, x: int, y: int, w: int, h: int, progress:
         tw, th = bbox[2] - bbox[0], bbox[3] - bbox[1]
         tx = x + w - tw - 6
         ty = y + (h - th) // 2
-        draw.text((tx + 1, ty + 1), pct_txt, font=f_pct, fill=(0, 0, 0, 200))
-        draw.text((tx, ty), pct_txt, font=f_pct, fill=TEXT_PRI)
+        _draw_text(canvas, (tx + 1, ty + 1), pct_txt, font=f_pct, fill=(0, 0, 0, 200))
+        _draw_text(canvas, (tx, ty), pct_txt, font=f_pct, fill=TEXT_PRI)
 
 
 def _avatar_with_ring(canvas: Image.Image, avatar: Optional[Image.Image], cx: int, cy: int, av_size: int) -> None:
@@ -348,7 +406,7 @@ def _level_badge(canvas: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int,
         width=1
     )
     canvas.alpha_composite(badge)
-    draw.text((x + 11, y + 4), label, font=f, fill=NEON)
+    _draw_text(canvas, (x + 11, y + 4), label, font=f, fill=NEON)
 
 
 def _rank_badge(canvas: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int, rank_text: str) -> None:
@@ -366,12 +424,19 @@ def _rank_badge(canvas: Image.Image, draw: ImageDraw.ImageDraw, x: int, y: int,
         width=1
     )
     canvas.alpha_composite(badge)
-    draw.text((x + 9, y + 3), rank_text, font=f, fill=GOLD)
+    _draw_text(canvas, (x + 9, y + 3), rank_text, font=f, fill=GOLD)
 
 
 # ========================= BUILD FRAMES =========================
-def _build_xp_frame(
-    template: Image.Image,
+# Tout le premier plan (panneau, avatar, textes, barre) est identique d'une
+# frame à l'autre : il est dessiné une fois sur un calque RGBA transparent, puis
+# composé sur chaque frame du fond animé.
+def _compose_frames(templates: List[Image.Image], overlay: Image.Image) -> List[Image.Image]:
+    return [Image.alpha_composite(template, overlay) for template in templates]
+
+
+def _draw_xp_foreground(
+    canvas: Image.Image,
     name: str,
     avatar: Optional[Image.Image],
     level: int,
@@ -381,8 +446,7 @@ def _build_xp_frame(
     rank: Optional[int] = None,
     total_members: Optional[int] = None,
 ) -> Image.Image:
-    """Frame pour la carte XP avec classement."""
-    canvas = template.copy()
+    """Premier plan de la carte XP avec classement."""
     PAD = 16
     _glass_panel(canvas, PAD, PAD, XP_W - PAD * 2, XP_H - PAD * 2, r=20)
 
@@ -397,14 +461,14 @@ def _build_xp_frame(
     # Nom (NotoSans Bold)
     f_name = _font(24, bold=True)
     name_s = name[:22] + ("…" if len(name) > 22 else "")
-    draw.text((TX, PAD + 12), name_s, font=f_name, fill=TEXT_PRI)
+    _draw_text(canvas, (TX, PAD + 12), name_s, font=f_name, fill=TEXT_PRI)
 
     # Badge LVL
     bbox = draw.textbbox((TX, PAD + 12), name_s, font=f_name)
     _level_badge(canvas, draw, bbox[2] + 8, PAD + 16, level)
 
     # XP info
-    draw.text((TX, PAD + 44), f"{xp_progress:,} / {xp_required:,} XP", font=_font(14), fill=TEXT_SEC)
+    _draw_text(canvas, (TX, PAD + 44), f"{xp_progress:,} / {xp_required:,} XP", font=_font(14), fill=TEXT_SEC)
 
     # Barre XP (sans glow circle)
     BAR_X = TX
@@ -416,7 +480,7 @@ def _build_xp_frame(
     # Total XP + classement sur la même ligne
     bottom_y = BAR_Y + 22
     total_txt = f"Total : {xp_total:,} XP"
-    draw.text((TX, bottom_y), total_txt, font=_font(12), fill=TEXT_MUT)
+    _draw_text(canvas, (TX, bottom_y), total_txt, font=_font(12), fill=TEXT_MUT)
 
     # Classement à droite
     if rank is not None:
@@ -433,8 +497,12 @@ def _build_xp_frame(
     return canvas
 
 
-def _build_levelup_frame(
-    template: Image.Image,
+def _build_xp_overlay(*args, **kwargs) -> Image.Image:
+    return _draw_xp_foreground(Image.new("RGBA", (XP_W, XP_H), (0, 0, 0, 0)), *args, **kwargs)
+
+
+def _draw_levelup_foreground(
+    canvas: Image.Image,
     name: str,
     avatar: Optional[Image.Image],
     old_level: int,
@@ -442,8 +510,7 @@ def _build_levelup_frame(
     xp_progress: int,
     xp_required: int,
 ) -> Image.Image:
-    """Frame pour la carte LevelUp — titre en Sekuya."""
-    canvas = template.copy()
+    """Premier plan de la carte LevelUp — titre en Sekuya."""
     PAD = 16
     _glass_panel(canvas, PAD, PAD, LU_W - PAD * 2, LU_H - PAD * 2, r=20)
 
@@ -452,15 +519,14 @@ def _build_levelup_frame(
     CY = LU_H // 2
     _avatar_with_ring(canvas, avatar, CX, CY, AV)
 
-    draw = ImageDraw.Draw(canvas)
     TX = CX + AV // 2 + 28
 
     # "LEVEL UP !" en Sekuya
-    draw.text((TX, PAD + 8), "LEVEL UP !", font=_font_sekuya(30), fill=GOLD)
+    _draw_text(canvas, (TX, PAD + 8), "LEVEL UP !", font=_font_sekuya(30), fill=GOLD)
 
     name_s = name[:22] + ("…" if len(name) > 22 else "")
-    draw.text((TX, PAD + 46), name_s, font=_font(20, bold=True), fill=TEXT_PRI)
-    draw.text((TX, PAD + 72), f"Niveau {old_level} → {new_level}", font=_font(16), fill=TEXT_SEC)
+    _draw_text(canvas, (TX, PAD + 46), name_s, font=_font(20, bold=True), fill=TEXT_PRI)
+    _draw_text(canvas, (TX, PAD + 72), f"Niveau {old_level} → {new_level}", font=_font(16), fill=TEXT_SEC)
 
     # Barre XP (sans glow circle)
     BAR_X = TX
@@ -469,15 +535,19 @@ def _build_levelup_frame(
     ratio = xp_progress / xp_required if xp_required > 0 else 1.0
     _draw_xp_bar(canvas, BAR_X, BAR_Y, BAR_W, 14, ratio, True)
 
-    draw.text((TX, BAR_Y + 22), f"{xp_progress:,} / {xp_required:,} XP", font=_font(12), fill=TEXT_SEC)
+    _draw_text(canvas, (TX, BAR_Y + 22), f"{xp_progress:,} / {xp_required:,} XP", font=_font(12), fill=TEXT_SEC)
     return canvas
 
 
+def _build_levelup_overlay(*args, **kwargs) -> Image.Image:
+    return _draw_levelup_foreground(Image.new("RGBA", (LU_W, LU_H), (0, 0, 0, 0)), *args, **kwargs)
+
+
 def _build_topxp_frame(
     template: Image.Image,
     entries: List[Dict],
     avatars: List[Optional[Image.Image]],
-    xp_to_level_fn: Callable[[int], int]
+    xp_to_level_fn: Callable[[int], int] = xp_to_level
 ) -> Image.Image:
     """Frame statique pour /topxp (PNG) — titre en Sekuya."""
     canvas = template.copy()
@@ -527,7 +597,7 @@ def _build_topxp_frame(
         draw.text((av_x + AV_SIZE + 12, ry + 8), uname, font=_font(15, bold=True), fill=TEXT_PRI)
 
         xp_val = int(entry.get("xp", 0) or 0)
-        lv = xp_to_level_fn(xp_val)
+        lv = entry["level"] if "level" in entry else xp_to_level_fn(xp_val)
         rx = TOP_W - PAD - 20
 
         lv_txt = f"LVL {lv}"
@@ -573,9 +643,16 @@ def _encode_output(frames: List[Image.Image], duration: int = 80) -> io.BytesIO:
 
 
 # ========================= BUILDERS SYNC =========================
+def _decode_avatar(data: Optional[bytes], size: int) -> Optional[Image.Image]:
+    """Avatar RGBA brut (déjà redimensionné et masqué) → image."""
+    if not data:
+        return None
+    return Image.frombytes("RGBA", (size, size), data)
+
+
 def _build_xp_card_sync(
     name: str,
-    avatar: Optional[Image.Image],
+    avatar: Optional[bytes],
     level: int,
     xp_progress: int,
     xp_required: int,
@@ -584,63 +661,307 @@ def _build_xp_card_sync(
     total_members: Optional[int] = None,
 ) -> io.BytesIO:
     templates, duration = _load_bg_frames(XP_W, XP_H, MAX_XP_FRAMES)
-    return _encode_output(
-        [_build_xp_frame(t, name, avatar, level, xp_progress, xp_required, xp_total, rank, total_members) for t in templates],
-        duration
-    )
+    avatar = _decode_avatar(avatar, XP_AVATAR_SIZE)
+    overlay = _build_xp_overlay(name, avatar, level, xp_progress, xp_required, xp_total, rank, total_members)
+    return _encode_output(_compose_frames(templates, overlay), duration)
 
 
 def _build_levelup_sync(
     name: str,
-    avatar: Optional[Image.Image],
+    avatar: Optional[bytes],
     old_level: int,
     new_level: int,
     xp_progress: int,
     xp_required: int,
 ) -> io.BytesIO:
     templates, duration = _load_bg_frames(LU_W, LU_H, MAX_XP_FRAMES)
-    return _encode_output(
-        [_build_levelup_frame(t, name, avatar, old_level, new_level, xp_progress, xp_required) for t in templates],
-        duration
-    )
+    avatar = _decode_avatar(avatar, XP_AVATAR_SIZE)
+    overlay = _build_levelup_overlay(name, avatar, old_level, new_level, xp_progress, xp_required)
+    return _encode_output(_compose_frames(templates, overlay), duration)
 
 
 def _build_topxp_sync(
     guild_name: str,
     entries: List[Dict],
-    avatars: List[Optional[Image.Image]],
-    xp_to_level_fn: Callable[[int], int]
+    avatars: List[Optional[bytes]],
 ) -> io.BytesIO:
+    """``entries`` portent déjà leur niveau (calculé par le processus principal)."""
     template = _build_topxp_template()
-    return _encode_output([_build_topxp_frame(template, entries, avatars, xp_to_level_fn)])
+    images = [_decode_avatar(data, TOP_AVATAR_SIZE) for data in avatars]
+    return _encode_output([_build_topxp_frame(template, entries, images)])
+
+
+# ========================= POOL DE RENDU =========================
+# Le rendu (composition des 18 frames + encodage GIF) tourne dans des processus
+# dédiés pour ne pas disputer le GIL à la boucle asyncio. Seuls des octets
+# traversent la frontière : avatars RGBA bruts à l'aller, carte encodée au retour.
+_render_pool: Optional[ProcessPoolExecutor] = None
+# Après un arrêt ou une panne, le pool n'est jamais recréé : forker le processus
+# vivant (boucle, threads DB, aiohttp) risquerait un interblocage dans l'enfant.
+_render_pool_closed = False
+_render_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _init_render_worker() -> None:
+    # Les signaux d'arrêt sont gérés par le processus principal (flush des batches).
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Après fork, les caches du parent sont hérités et ceci ne coûte rien ; en spawn, recharge tout.
+    warmup_sync()
+
+
+def _render_job(builder: Callable[..., io.BytesIO], *args) -> Tuple[bytes, float]:
+    started = time.perf_counter()
+    data = builder(*args).getvalue()
+    return data, time.perf_counter() - started
+
+
+def start_render_pool() -> Optional[ProcessPoolExecutor]:
+    """Démarre le pool de rendu (à appeler avant que le processus ne lance des threads)."""
+    global _render_pool
+    if CARD_RENDER_WORKERS <= 0 or _render_pool is not None or _render_pool_closed:
+        return _render_pool
+    # Polices téléchargées et fonds chargés une seule fois, dans le parent : les
+    # workers forkés en héritent au lieu de se concurrencer sur les fichiers.
+    try:
+        warmup_sync()
+    except Exception:
+        logger.exception("Warmup des cartes échoué avant le démarrage du pool de rendu")
+    # fork plutôt que spawn : spawn réexécuterait main.py (config, bot) dans chaque worker.
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    _render_pool = ProcessPoolExecutor(
+        max_workers=CARD_RENDER_WORKERS,
+        mp_context=multiprocessing.get_context(method),
+        initializer=_init_render_worker,
+    )
+    # Lance les workers tout de suite pour qu'ils préchargent polices et fonds.
+    _render_pool.submit(os.getpid)
+    logger.info("Pool de rendu des cartes : %d processus (%s)", CARD_RENDER_WORKERS, method)
+    return _render_pool
+
+
+def shutdown_render_pool() -> None:
+    """Arrête le pool ; les rendus suivants se font dans le pool de threads."""
+    global _render_pool, _render_pool_closed
+    _render_pool_closed = True
+    pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _render(kind: str, builder: Callable[..., io.BytesIO], *args) -> io.BytesIO:
+    loop = asyncio.get_running_loop()
+    # Pas de démarrage paresseux ici : le pool n'est créé que par run_bot, avant les threads.
+    pool = _render_pool
+    submitted = time.perf_counter()
+    try:
+        data, render_seconds = await loop.run_in_executor(pool, _render_job, builder, *args)
+    except (BrokenProcessPool, RuntimeError, asyncio.CancelledError) as exc:
+        # RuntimeError / annulation : le pool a été arrêté pendant le rendu (shutdown
+        # annule les futures en attente). Une annulation de l'appelant se propage.
+        if pool is None or (isinstance(exc, asyncio.CancelledError) and asyncio.current_task().cancelling()):
+            raise
+        if isinstance(exc, BrokenProcessPool):
+            logger.warning("Pool de rendu cassé ; rendu de %s et des suivants dans le pool de threads", kind)
+        shutdown_render_pool()
+        data, render_seconds = await loop.run_in_executor(None, _render_job, builder, *args)
+    wait_seconds = max(time.perf_counter() - submitted - render_seconds, 0.0)
+
+    stats = _render_stats.setdefault(kind, {"count": 0, "wait_seconds": 0.0, "render_seconds": 0.0, "max_wait": 0.0})
+    stats["count"] += 1
+    stats["wait_seconds"] += wait_seconds
+    stats["render_seconds"] += render_seconds
+    stats["max_wait"] = max(stats["max_wait"], wait_seconds)
+    logger.debug("Carte %s : attente %.1f ms, rendu %.1f ms", kind, wait_seconds * 1e3, render_seconds * 1e3)
+    return io.BytesIO(data)
+
+
+def render_stats() -> Dict[str, Dict[str, float]]:
+    """Attente (file + transfert) et rendu moyens par type de carte, en ms."""
+    return {
+        kind: {
+            "count": int(stats["count"]),
+            "avg_wait_ms": round(stats["wait_seconds"] / stats["count"] * 1e3, 1),
+            "max_wait_ms": round(stats["max_wait"] * 1e3, 1),
+            "avg_render_ms": round(stats["render_seconds"] / stats["count"] * 1e3, 1),
+        }
+        for kind, stats in _render_stats.items()
+    }
 
 
 # ========================= AVATAR FETCH =========================
-async def _fetch_avatar(url: Optional[str], size: int) -> Optional[Image.Image]:
-    if not url:
-        return None
-    key = (url, size)
-    if key in _avatar_cache:
-        return _avatar_cache[key]
+_DISCORD_CDN_HOSTS = ("cdn.discordapp.com", "media.discordapp.net")
+# Les échecs ne pèsent rien en octets : le nombre d'entrées est borné à part.
+_AVATAR_CACHE_MAX_ENTRIES = 4096
+_http_session: Optional[aiohttp.ClientSession] = None
+_avatar_fetch_slots = asyncio.Semaphore(AVATAR_FETCH_CONCURRENCY)
+_avatar_inflight: Dict[Tuple[str, int], "asyncio.Future[Optional[bytes]]"] = {}
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    """Session HTTP partagée (pool de connexions keep-alive), créée au premier usage."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=AVATAR_FETCH_CONCURRENCY * 2, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=4),
+        )
+    return _http_session
+
+
+def _sized_avatar_url(url: str, size: int) -> str:
+    """URL CDN Discord au format PNG et à la plus petite taille (puissance de 2) ≥ ``size``."""
+    parsed = urlparse(url)
+    if parsed.hostname not in _DISCORD_CDN_HOSTS:
+        return url
+    cdn_size = 16
+    while cdn_size < size and cdn_size < 4096:
+        cdn_size *= 2
+    path, dot, ext = parsed.path.rpartition(".")
+    if dot and ext.lower() in ("webp", "gif", "jpg", "jpeg", "png"):
+        parsed = parsed._replace(path=f"{path}.png")
+    return urlunparse(parsed._replace(query=urlencode({"size": cdn_size})))
+
+
+def _avatar_cache_get(key: Tuple[str, int]) -> Tuple[bool, Optional[bytes]]:
+    item = _avatar_cache.get(key)
+    if item is None:
+        _avatar_cache_counters["misses"] += 1
+        return False, None
+    expires_at, data = item
+    if expires_at <= time.monotonic():
+        _avatar_cache_drop(key)
+        _avatar_cache_counters["misses"] += 1
+        return False, None
+    _avatar_cache.move_to_end(key)
+    _avatar_cache_counters["hits" if data is not None else "negative_hits"] += 1
+    return True, data
+
+
+def _avatar_cache_drop(key: Tuple[str, int]) -> None:
+    global _avatar_cache_bytes
+    item = _avatar_cache.pop(key, None)
+    if item is not None and item[1] is not None:
+        _avatar_cache_bytes -= len(item[1])
+
+
+def _avatar_cache_put(key: Tuple[str, int], data: Optional[bytes]) -> None:
+    global _avatar_cache_bytes
+    _avatar_cache_drop(key)
+    # Échec mis en cache brièvement : un CDN indisponible n'est pas réinterrogé à chaque carte.
+    ttl = AVATAR_CACHE_TTL if data is not None else AVATAR_NEGATIVE_TTL
+    _avatar_cache[key] = (time.monotonic() + ttl, data)
+    if data is not None:
+        _avatar_cache_bytes += len(data)
+    while _avatar_cache and (
+        _avatar_cache_bytes > AVATAR_CACHE_BYTES or len(_avatar_cache) > _AVATAR_CACHE_MAX_ENTRIES
+    ):
+        oldest = next(iter(_avatar_cache))
+        _avatar_cache_drop(oldest)
+        _avatar_cache_counters["evictions"] += 1
+
+
+async def close_http_session() -> None:
+    """Ferme la session HTTP partagée (à l'arrêt du bot)."""
+    global _http_session
+    session, _http_session = _http_session, None
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def avatar_cache_stats() -> Dict[str, int]:
+    return {
+        **_avatar_cache_counters,
+        "entries": len(_avatar_cache),
+        "bytes": _avatar_cache_bytes,
+        "budget": AVATAR_CACHE_BYTES,
+        "in_flight": len(_avatar_inflight),
+    }
+
+
+async def _download_avatar(url: str, size: int) -> Optional[bytes]:
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=4)) as response:
+        async with _avatar_fetch_slots:
+            async with _get_http_session().get(_sized_avatar_url(url, size)) as response:
                 if response.status != 200:
-                    _avatar_cache[key] = None
                     return None
                 data = await response.read()
         img = Image.open(io.BytesIO(data)).convert("RGBA")
-        img = img.resize((size, size), Image.LANCZOS)
+        if img.size != (size, size):
+            img = img.resize((size, size), Image.LANCZOS)
         mask = _rounded_rect_mask(size, size, size // 2)
         out = Image.new("RGBA", (size, size), (0, 0, 0, 0))
         out.paste(img, mask=mask)
-        _avatar_cache[key] = out
-        return out
+        return out.tobytes()
     except Exception:
-        _avatar_cache[key] = None
         return None
 
 
+async def _fetch_avatar(url: Optional[str], size: int) -> Optional[bytes]:
+    """Avatar redimensionné et arrondi, en octets RGBA bruts (transmis tel quel au pool de rendu)."""
+    if not url:
+        return None
+    key = (url, size)
+    found, data = _avatar_cache_get(key)
+    if found:
+        return data
+    # Requêtes simultanées pour le même avatar : un seul téléchargement.
+    pending = _avatar_inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+    future = asyncio.get_running_loop().create_future()
+    _avatar_inflight[key] = future
+    try:
+        data = await _download_avatar(url, size)
+        _avatar_cache_put(key, data)
+        future.set_result(data)
+        return data
+    finally:
+        if not future.done():
+            future.set_result(None)
+        del _avatar_inflight[key]
+
+
+async def prefetch_avatars(urls: List[Optional[str]], size: int) -> List[Optional[bytes]]:
+    """Avatars de ``urls`` en parallèle (la concurrence réseau reste bornée par le sémaphore)."""
+    return list(await asyncio.gather(*(_fetch_avatar(url, size) for url in urls)))
+
+
+# ========================= CACHE DES CARTES =========================
+def _card_cache_get(key: tuple) -> Optional[bytes]:
+    data = _card_cache.get(key)
+    if data is None:
+        _card_cache_counters["misses"] += 1
+        return None
+    _card_cache.move_to_end(key)
+    _card_cache_counters["hits"] += 1
+    return data
+
+
+def _card_cache_put(key: tuple, data: bytes) -> None:
+    global _card_cache_bytes
+    if len(data) > CARD_CACHE_BYTES:
+        return
+    previous = _card_cache.pop(key, None)
+    if previous is not None:
+        _card_cache_bytes -= len(previous)
+    _card_cache[key] = data
+    _card_cache_bytes += len(data)
+    while _card_cache_bytes > CARD_CACHE_BYTES:
+        _, evicted = _card_cache.popitem(last=False)
+        _card_cache_bytes -= len(evicted)
+        _card_cache_counters["evictions"] += 1
+
+
+def card_cache_stats() -> Dict[str, int]:
+    return {
+        **_card_cache_counters,
+        "entries": len(_card_cache),
+        "bytes": _card_cache_bytes,
+        "budget": CARD_CACHE_BYTES,
+    }
+
+
 # ========================= API PUBLIQUE =========================
 async def generate_xp_card(
     member_name: str,
@@ -653,22 +974,26 @@ async def generate_xp_card(
     total_members: Optional[int] = None,
 ) -> Tuple[io.BytesIO, str]:
     """Génère une carte XP animée (GIF avec 18 frames) avec classement optionnel."""
-    avatar = await _fetch_avatar(avatar_url, 100)
-    loop = asyncio.get_event_loop()
-    buf = await loop.run_in_executor(
-        None,
-        partial(
-            _build_xp_card_sync,
-            member_name,
-            avatar,
-            level,
-            xp_progress,
-            xp_required,
-            xp_total,
-            rank,
-            total_members,
-        )
+    avatar = await _fetch_avatar(avatar_url, XP_AVATAR_SIZE)
+    # Clé sur le contenu de l'avatar (et non son URL) : même rendu → mêmes octets.
+    avatar_digest = hashlib.blake2b(avatar, digest_size=16).digest() if avatar else None
+    key = (member_name, avatar_digest, level, xp_progress, xp_required, xp_total, rank, total_members)
+    cached = _card_cache_get(key)
+    if cached is not None:
+        return io.BytesIO(cached), "xp_card.gif"
+    buf = await _render(
+        "xp",
+        _build_xp_card_sync,
+        member_name,
+        avatar,
+        level,
+        xp_progress,
+        xp_required,
+        xp_total,
+        rank,
+        total_members,
     )
+    _card_cache_put(key, buf.getvalue())
     return buf, "xp_card.gif"
 
 
@@ -682,19 +1007,16 @@ async def generate_levelup_card(
     xp_required: int,
 ) -> Tuple[io.BytesIO, str]:
     """Génère une carte LevelUp animée (GIF avec 18 frames)."""
-    avatar = await _fetch_avatar(avatar_url, 100)
-    loop = asyncio.get_event_loop()
-    buf = await loop.run_in_executor(
-        None,
-        partial(
-            _build_levelup_sync,
-            member_name,
-            avatar,
-            old_level,
-            new_level,
-            xp_progress,
-            xp_required,
-        )
+    avatar = await _fetch_avatar(avatar_url, XP_AVATAR_SIZE)
+    buf = await _render(
+        "levelup",
+        _build_levelup_sync,
+        member_name,
+        avatar,
+        old_level,
+        new_level,
+        xp_progress,
+        xp_required,
     )
     return buf, "levelup.gif"
 
@@ -702,23 +1024,16 @@ async def generate_levelup_card(
 async def generate_topxp_card(
     guild_name: str,
     entries: List[Dict],
-    xp_to_level_fn: Callable[[int], int]
+    xp_to_level_fn: Callable[[int], int] = xp_to_level
 ) -> Tuple[io.BytesIO, str]:
     """Génère une carte /topxp statique (PNG avec BackgroundTopXP)."""
-    avatars = await asyncio.gather(*[
-        _fetch_avatar(e.get("avatar_url"), 32) for e in entries[:10]
-    ])
-    loop = asyncio.get_event_loop()
-    buf = await loop.run_in_executor(
-        None,
-        partial(
-            _build_topxp_sync,
-            guild_name,
-            entries[:10],
-            avatars,
-            xp_to_level_fn
-        )
-    )
+    avatars = await prefetch_avatars([e.get("avatar_url") for e in entries[:10]], TOP_AVATAR_SIZE)
+    # Les niveaux sont calculés ici : xp_to_level_fn ne traverse pas la frontière de processus.
+    rows = []
+    for entry in entries[:10]:
+        xp_val = int(entry.get("xp", 0) or 0)
+        rows.append({"user_name": entry.get("user_name"), "xp": xp_val, "level": xp_to_level_fn(xp_val)})
+    buf = await _render("topxp", _build_topxp_sync, guild_name, rows, avatars)
     return buf, "topxp.png"
 
 
@@ -808,6 +1123,5 @@ def _build_roles_card_sync() -> io.BytesIO:
 
 async def generate_roles_card() -> Tuple[io.BytesIO, str]:
     """C'est cette fonction que main.py va appeler pour récupérer l'image finale."""
-    loop = asyncio.get_event_loop()
-    buf = await loop.run_in_executor(None, _build_roles_card_sync)
+    buf = await _render("roles", _build_roles_card_sync)
     return buf, "role_card.png"
@@ -0,0 +1,102 @@
+"""Tables de cooldown à expiration automatique.
+
+Chaque table garde deux générations de dictionnaires ``clé → horodatage``
+(millisecondes monotones, entiers). Toutes les ``ttl`` millisecondes la
+génération courante devient l'ancienne et l'ancienne est jetée d'un bloc :
+l'expiration coûte O(1) par accès, sans parcours ni tâche de fond, et la
+mémoire reste bornée par l'activité des deux dernières fenêtres.
+"""
+import sys
+import time
+from typing import Optional
+
+
+def now_ms() -> int:
+    return time.monotonic_ns() // 1_000_000
+
+
+def pack_key(*ids: int) -> int:
+    """Concatène des snowflakes Discord (64 bits) en un seul entier."""
+    key = 0
+    for value in ids:
+        key = (key << 64) | value
+    return key
+
+
+class ExpiringMap:
+    __slots__ = ("ttl_ms", "expired", "_current", "_previous", "_rotated_at")
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_ms = max(1, int(ttl_seconds * 1000))
+        self.expired = 0
+        self._current: dict[int, int] = {}
+        self._previous: dict[int, int] = {}
+        self._rotated_at = now_ms()
+
+    def _rotate(self, now: int) -> None:
+        elapsed = now - self._rotated_at
+        if elapsed < self.ttl_ms:
+            return
+        # Tout ce qui est dans l'ancienne génération a au moins `ttl` d'âge.
+        self.expired += len(self._previous)
+        if elapsed >= 2 * self.ttl_ms:
+            self.expired += len(self._current)
+            self._previous = {}
+        else:
+            self._previous = self._current
+        self._current = {}
+        self._rotated_at = now
+
+    def get(self, key: int, now: Optional[int] = None) -> Optional[int]:
+        """Horodatage (ms) de ``key`` s'il date de moins de ``ttl``, sinon None."""
+        now = now_ms() if now is None else now
+        self._rotate(now)
+        stamp = self._current.get(key)
+        if stamp is None:
+            stamp = self._previous.get(key)
+        if stamp is None or now - stamp >= self.ttl_ms:
+            return None
+        return stamp
+
+    def touch(self, key: int, now: Optional[int] = None) -> None:
+        now = now_ms() if now is None else now
+        self._rotate(now)
+        self._previous.pop(key, None)
+        self._current[key] = now
+
+    def active(self, key: int, window_ms: Optional[int] = None, now: Optional[int] = None) -> bool:
+        """True si ``key`` a été touchée il y a moins de ``window_ms`` (``ttl`` par défaut)."""
+        now = now_ms() if now is None else now
+        stamp = self.get(key, now)
+        return stamp is not None and now - stamp < (self.ttl_ms if window_ms is None else window_ms)
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def memory_bytes(self) -> int:
+        total = sys.getsizeof(self._current) + sys.getsizeof(self._previous)
+        for generation in (self._current, self._previous):
+            for key, stamp in generation.items():
+                total += sys.getsizeof(key) + sys.getsizeof(stamp)
+        return total
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self), "bytes": self.memory_bytes(), "expired": self.expired}
+
+    def export_ages(self, now: Optional[int] = None) -> dict[int, int]:
+        """Âge (ms) des entrées encore valides : les horodatages monotones ne survivent pas au processus."""
+        now = now_ms() if now is None else now
+        self._rotate(now)
+        ages: dict[int, int] = {}
+        for generation in (self._previous, self._current):
+            for key, stamp in generation.items():
+                if now - stamp < self.ttl_ms:
+                    ages[key] = now - stamp
+        return ages
+
+    def restore_ages(self, ages: dict[int, int], elapsed_ms: int = 0, now: Optional[int] = None) -> None:
+        now = now_ms() if now is None else now
+        for key, age in ages.items():
+            age += elapsed_ms
+            if age < self.ttl_ms:
+                self._current[key] = now - age
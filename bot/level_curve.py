@@ -0,0 +1,60 @@
+"""Courbe de niveaux XP partagée (bot, XP vocal, cartes).
+
+Les seuils cumulés sont précalculés une seule fois à l'import ; les
+conversions XP → niveau se font ensuite par recherche dichotomique (O(log n)).
+"""
+from bisect import bisect_right
+
+MAX_LEVEL = 99
+XP_BASE_BY_LEVEL = 100
+XP_GROWTH_FACTOR = 1.12
+
+# XP nécessaire pour passer du niveau `i` au niveau `i + 1`
+_LEVEL_COSTS: tuple[int, ...] = tuple(
+    int(XP_BASE_BY_LEVEL * (XP_GROWTH_FACTOR ** level)) for level in range(MAX_LEVEL)
+)
+
+
+def _cumulative(costs: tuple[int, ...]) -> tuple[int, ...]:
+    totals = [0]
+    for cost in costs:
+        totals.append(totals[-1] + cost)
+    return tuple(totals)
+
+
+# LEVEL_THRESHOLDS[n] = XP total requis pour atteindre le niveau n (0 ≤ n ≤ MAX_LEVEL)
+LEVEL_THRESHOLDS: tuple[int, ...] = _cumulative(_LEVEL_COSTS)
+MAX_XP = LEVEL_THRESHOLDS[MAX_LEVEL]
+
+
+def xp_required_for_next_level(level: int) -> int:
+    if level < 0:
+        return XP_BASE_BY_LEVEL
+    if level < MAX_LEVEL:
+        return _LEVEL_COSTS[level]
+    return int(XP_BASE_BY_LEVEL * (XP_GROWTH_FACTOR ** level))
+
+
+def xp_total_for_level(level: int) -> int:
+    if level <= 0:
+        return 0
+    if level <= MAX_LEVEL:
+        return LEVEL_THRESHOLDS[level]
+    return LEVEL_THRESHOLDS[MAX_LEVEL] + sum(
+        xp_required_for_next_level(lvl) for lvl in range(MAX_LEVEL, level)
+    )
+
+
+def xp_to_level(xp: int) -> int:
+    if xp <= 0:
+        return 0
+    return min(MAX_LEVEL, bisect_right(LEVEL_THRESHOLDS, xp) - 1)
+
+
+def xp_in_current_level(xp: int) -> tuple[int, int]:
+    """Retourne (progression dans le niveau courant, XP requis pour le suivant)."""
+    level = xp_to_level(xp)
+    if level >= MAX_LEVEL:
+        req = _LEVEL_COSTS[MAX_LEVEL - 1]
+        return req, req
+    return max(0, xp - LEVEL_THRESHOLDS[level]), _LEVEL_COSTS[level]
@@ -0,0 +1,109 @@
+"""Classification des liens et invitations Discord d'un message en une passe.
+
+Une seule expression régulière extrait à la fois les invitations et les URL.
+Le verdict d'un hôte vient d'un ensemble de suffixes (labels inversés), mis en
+cache LRU, et le verdict d'un contenu complet est lui aussi mis en cache : un
+même message de spam répété pendant un raid est classé en temps constant.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+ALLOWED_VIDEO_DOMAINS = ("youtube.com", "youtu.be", "tiktok.com")
+ALLOWED_GIF_DOMAINS = (
+    "tenor.com",
+    "giphy.com",
+    "klipy.com",
+    "klipy.co",
+    "klipy.io",
+    "klipy.app",
+    "klipy.cloud",
+    "klipy-cdn.com",
+    "discordapp.com",
+    "discord.com",
+    "media.discordapp.net",
+    "cdn.discordapp.com",
+)
+
+_INVITE_PATTERN = r"(?:https?://)?(?:www\.)?(?:discord\.gg|discord(?:app)?\.com/invite)/\S+"
+_URL_PATTERN = r"https?://[^\s]+|www\.[^\s]+"
+
+# L'invitation est essayée en premier à chaque position ; une URL autorisée est
+# ensuite revérifiée, car elle peut contenir une invitation plus loin.
+_SCANNER = re.compile(rf"(?P<invite>{_INVITE_PATTERN})|(?P<url>{_URL_PATTERN})", re.IGNORECASE)
+_INVITE_REGEX = re.compile(_INVITE_PATTERN, re.IGNORECASE)
+
+# ("com", "tenor") pour "tenor.com" : un hôte est autorisé si un préfixe de ses
+# labels inversés figure dans l'ensemble (équivaut à `host == d or host.endswith("." + d)`).
+_ALLOWED_SUFFIXES = frozenset(
+    tuple(reversed(domain.split("."))) for domain in ALLOWED_GIF_DOMAINS + ALLOWED_VIDEO_DOMAINS
+)
+_MAX_SUFFIX_LABELS = max(len(suffix) for suffix in _ALLOWED_SUFFIXES)
+
+
+class LinkScan(NamedTuple):
+    blocked_links: tuple[str, ...]
+    contains_invite: bool
+
+    @property
+    def blocked(self) -> bool:
+        return bool(self.blocked_links) or self.contains_invite
+
+
+@lru_cache(maxsize=4096)
+def is_allowed_host(host: str) -> bool:
+    labels = host.split(".")
+    labels.reverse()
+    for size in range(1, min(len(labels), _MAX_SUFFIX_LABELS) + 1):
+        if tuple(labels[:size]) in _ALLOWED_SUFFIXES:
+            return True
+    return False
+
+
+def is_allowed_link(url: str) -> bool:
+    normalized = url.lower().strip("()[]<>.,!?\"'")
+    if not normalized.startswith(("http://", "https://")):
+        normalized = f"https://{normalized}"
+    try:
+        parsed = urlparse(normalized)
+        host = (parsed.hostname or "").lower()
+    except ValueError:
+        return False
+    if (parsed.path or "").lower().endswith((".gif", ".gifv")):
+        return True
+    return is_allowed_host(host)
+
+
+@lru_cache(maxsize=2048)
+def scan(content: str) -> LinkScan:
+    """Liens bloqués et présence d'une invitation Discord dans ``content``."""
+    blocked: list[str] = []
+    contains_invite = False
+    for match in _SCANNER.finditer(content):
+        url = match.group("url")
+        if url is None:
+            contains_invite = True
+        elif not is_allowed_link(url):
+            blocked.append(url)
+        elif not contains_invite and _INVITE_REGEX.search(url):
+            contains_invite = True
+    return LinkScan(tuple(blocked), contains_invite)
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {
+        "hosts": is_allowed_host.cache_info()._asdict(),
+        "contents": scan.cache_info()._asdict(),
+    }
+
+
+__all__ = [
+    "ALLOWED_GIF_DOMAINS",
+    "ALLOWED_VIDEO_DOMAINS",
+    "LinkScan",
+    "cache_stats",
+    "is_allowed_host",
+    "is_allowed_link",
+    "scan",
+]
@@ -0,0 +1,249 @@
+"""Pipeline asynchrone de traitement des messages.
+
+``on_message`` ne garde que le filtrage synchrone rapide (modération, slow
+mode) puis confie le reste à des étages. L'activité (XP, quêtes, logs) passe
+par une file bornée par shard (``user_id % shards``) vidée par un worker
+dédié, ce qui conserve l'ordre des messages d'un même utilisateur. Les
+commandes, elles, tournent chacune dans leur tâche (comme discord.py par
+défaut), avec un plafond de concurrence et un plafond d'éléments admis : une
+commande longue (``!syncroles``, rendu de carte) ne bloque ni les autres
+utilisateurs ni ``on_message``, et les commandes d'un même auteur restent
+exécutées dans l'ordre.
+
+Comportement en cas de saturation d'un étage (explicite par étage) :
+
+- ``wait`` : l'appelant attend une place (contre-pression) ;
+- ``drop`` : le message est ignoré par l'étage et compté ;
+- ``degrade`` : le handler dégradé (synchrone, sans I/O) est appelé à la place.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_WAIT = "wait"
+OVERFLOW_DROP = "drop"
+OVERFLOW_DEGRADE = "degrade"
+
+
+class _BoundedStage:
+    """Politique de saturation et compteurs communs aux deux sortes d'étages."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[None]],
+        maxsize: int,
+        overflow: str,
+        degrade: Optional[Callable[[Any], None]],
+    ) -> None:
+        if overflow not in (OVERFLOW_WAIT, OVERFLOW_DROP, OVERFLOW_DEGRADE):
+            raise ValueError(f"Politique de saturation inconnue : {overflow}")
+        if overflow == OVERFLOW_DEGRADE and degrade is None:
+            raise ValueError("La politique 'degrade' nécessite un handler dégradé")
+        self.name = name
+        self.handler = handler
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.degrade = degrade
+        self.processed = 0
+        self.dropped = 0
+        self.degraded = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def _reject(self, item: Any) -> None:
+        """Élément refusé par un étage plein (politique ``drop`` ou ``degrade``)."""
+        if self.overflow == OVERFLOW_DEGRADE:
+            self.degraded += 1
+            try:
+                self.degrade(item)
+            except Exception:
+                logger.exception("Erreur dans le handler dégradé de l'étage %s", self.name)
+        else:
+            self.dropped += 1
+        if (self.dropped + self.degraded) % 100 == 1:
+            logger.warning("Étage %s saturé (%s) : %s", self.name, self.overflow, self.stats())
+
+    async def _handle(self, item: Any) -> None:
+        started = time.perf_counter()
+        try:
+            await self.handler(item)
+        except Exception:
+            self.failed += 1
+            logger.exception("Erreur dans l'étage %s", self.name)
+        finally:
+            self.processed += 1
+            self.busy_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "maxsize": self.maxsize,
+            "overflow": self.overflow,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "degraded": self.degraded,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class Stage(_BoundedStage):
+    """File bornée par shard, vidée par un worker : ordre strict par shard."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[None]],
+        *,
+        shards: int = 4,
+        maxsize: int = 500,
+        overflow: str = OVERFLOW_DROP,
+        degrade: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        super().__init__(name, handler, maxsize, overflow, degrade)
+        self.shards = max(1, shards)
+        self._queues: list[asyncio.Queue] = []
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        loop = asyncio.get_running_loop()
+        self._queues = [asyncio.Queue(maxsize=self.maxsize) for _ in range(self.shards)]
+        self._workers = [
+            loop.create_task(self._worker(queue), name=f"pipeline-{self.name}-{idx}")
+            for idx, queue in enumerate(self._queues)
+        ]
+
+    async def submit(self, item: Any, shard_key: int) -> bool:
+        """Place ``item`` dans la file de son shard ; retourne False s'il n'a pas été mis en file."""
+        self.start()
+        queue = self._queues[shard_key % self.shards]
+        try:
+            queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self.overflow == OVERFLOW_WAIT:
+            await queue.put(item)
+            return True
+        self._reject(item)
+        return False
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            item = await queue.get()
+            try:
+                await self._handle(item)
+            finally:
+                queue.task_done()
+
+    def depths(self) -> list[int]:
+        return [queue.qsize() for queue in self._queues]
+
+    def stats(self) -> dict[str, Any]:
+        return {"depths": self.depths(), **super().stats()}
+
+
+class ConcurrentStage(_BoundedStage):
+    """Une tâche par élément : au plus ``limit`` handlers en cours, ``maxsize`` éléments admis.
+
+    Les éléments d'une même clé (l'auteur) restent traités dans l'ordre : chaque
+    tâche attend la précédente de sa clé avant de prendre une place d'exécution.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[None]],
+        *,
+        limit: int = 32,
+        maxsize: int = 500,
+        overflow: str = OVERFLOW_WAIT,
+        degrade: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        super().__init__(name, handler, max(1, maxsize), overflow, degrade)
+        self.limit = max(1, limit)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._admission: Optional[asyncio.Semaphore] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._tails: dict[int, asyncio.Task] = {}
+        self.running = 0
+
+    def start(self) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+            self._admission = asyncio.Semaphore(self.maxsize)
+
+    async def submit(self, item: Any, key: int) -> bool:
+        """Lance le traitement de ``item`` ; retourne False s'il a été refusé (étage plein)."""
+        self.start()
+        if self._admission.locked():
+            if self.overflow != OVERFLOW_WAIT:
+                self._reject(item)
+                return False
+        await self._admission.acquire()
+        previous = self._tails.get(key)
+        task = asyncio.get_running_loop().create_task(self._run(item, previous), name=f"pipeline-{self.name}")
+        self._tasks.add(task)
+        self._tails[key] = task
+        task.add_done_callback(lambda done: self._finished(done, key))
+        return True
+
+    def _finished(self, task: asyncio.Task, key: int) -> None:
+        self._tasks.discard(task)
+        if self._tails.get(key) is task:
+            del self._tails[key]
+        self._admission.release()
+
+    async def _run(self, item: Any, previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await asyncio.wait((previous,))
+        async with self._slots:
+            self.running += 1
+            try:
+                await self._handle(item)
+            finally:
+                self.running -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "waiting": len(self._tasks) - self.running,
+            **super().stats(),
+        }
+
+
+class MessagePipeline:
+    """Commandes concurrentes + étage d'activité shardé (XP, quêtes, logs)."""
+
+    def __init__(self, commands: ConcurrentStage, activity: Stage) -> None:
+        self.commands = commands
+        self.activity = activity
+
+    def start(self) -> None:
+        self.commands.start()
+        self.activity.start()
+
+    async def dispatch(self, message: Any, is_command: bool) -> None:
+        # Les commandes ne partagent aucune file avec l'activité et ne sont jamais attendues ici.
+        if is_command:
+            await self.commands.submit(message, message.author.id)
+        await self.activity.submit(message, message.author.id)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {"commands": self.commands.stats(), "activity": self.activity.stats()}
+
+
+__all__ = [
+    "ConcurrentStage",
+    "MessagePipeline",
+    "OVERFLOW_DEGRADE",
+    "OVERFLOW_DROP",
+    "OVERFLOW_WAIT",
+    "Stage",
+]
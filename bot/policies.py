@@ -0,0 +1,157 @@
+"""Politiques de sécurité compilées à partir de la configuration.
+
+Chaque section de ``Config`` (slow mode, anti-raid, anti-nuke) est convertie
+une seule fois en objet immuable (entiers déjà parsés, paliers déjà triés)
+au moment de ``update_config`` ; les gestionnaires remplacent leur politique
+par une simple affectation, sans jamais relire le dictionnaire brut sur le
+chemin chaud.
+"""
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+
+def _to_int(value: Any, fallback: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return fallback
+
+
+@dataclass(frozen=True)
+class SlowModeTier:
+    threshold: float
+    seconds: int
+    # Débit sous lequel le palier est quitté vers le bas (≤ threshold)
+    down_threshold: float
+
+
+@dataclass(frozen=True)
+class SlowModePolicy:
+    enabled: bool = False
+    window_seconds: int = 60
+    min_update_interval_seconds: int = 15
+    hysteresis: float = 1.0
+    # Triés par seuil décroissant
+    tiers: tuple[SlowModeTier, ...] = ()
+
+    @classmethod
+    def from_config(cls, conf: Optional[dict[str, Any]]) -> "SlowModePolicy":
+        conf = conf or {}
+        hysteresis = float(conf.get('hysteresis', 1.0))
+        tiers = []
+        for tier in conf.get('tiers') or []:
+            try:
+                threshold = float(tier.get('threshold', 0))
+                seconds = int(tier.get('seconds', 0))
+                down_threshold = float(tier.get('down_threshold') or threshold * hysteresis)
+            except (TypeError, ValueError, AttributeError):
+                continue
+            tiers.append(SlowModeTier(threshold, seconds, min(down_threshold, threshold)))
+        tiers.sort(key=lambda t: t.threshold, reverse=True)
+        return cls(
+            enabled=bool(conf.get('enabled', False)),
+            window_seconds=max(int(conf.get('window_seconds', 60)), 10),
+            min_update_interval_seconds=max(int(conf.get('min_update_interval_seconds', 15)), 5),
+            hysteresis=hysteresis,
+            tiers=tuple(tiers),
+        )
+
+    def select(self, rate_per_minute: float) -> int:
+        """Délai de slow mode du palier le plus élevé atteint par ``rate_per_minute``."""
+        for tier in self.tiers:
+            if rate_per_minute >= tier.threshold:
+                return max(tier.seconds, 0)
+        return 0
+
+    def select_from(self, rate_per_minute: float, current_seconds: int) -> int:
+        """Comme :meth:`select`, mais avec hystérésis par rapport au délai en place.
+
+        On monte dès qu'un seuil haut est atteint ; on ne descend que lorsque le
+        débit passe sous le seuil bas du palier courant, vers le plus haut
+        palier inférieur dont le seuil bas est encore atteint.
+        """
+        target = self.select(rate_per_minute)
+        if target >= current_seconds:
+            return target
+        for tier in self.tiers:
+            seconds = max(tier.seconds, 0)
+            if seconds > current_seconds:
+                continue
+            if seconds == current_seconds:
+                if rate_per_minute >= tier.down_threshold:
+                    return current_seconds
+                continue
+            if rate_per_minute >= tier.down_threshold:
+                return seconds
+        return 0
+
+
+@dataclass(frozen=True)
+class RaidPolicy:
+    join_threshold: int = 10
+    account_age_days: int = 7
+    lockdown_on_raid: bool = True
+    kick_young_accounts: bool = False
+    quarantine_role_id: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, conf: Optional[dict[str, Any]]) -> "RaidPolicy":
+        conf = conf or {}
+        quarantine_role_id = _to_int(conf.get('quarantineRoleId') or None, 0) or None
+        return cls(
+            join_threshold=_to_int(conf.get('joinThreshold', 10), 10),
+            account_age_days=_to_int(conf.get('accountAgeDays', 7), 7),
+            lockdown_on_raid=bool(conf.get('lockdownOnRaid', True)),
+            kick_young_accounts=bool(conf.get('kickYoungAccounts', False)),
+            quarantine_role_id=quarantine_role_id,
+        )
+
+
+@dataclass(frozen=True)
+class NukePolicy:
+    time_window: int = 30
+    audit_log_max_age: int = 15
+    thresholds: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    global_action_limit: int = 4
+    bot_action_limit: int = 1
+    punitive_action: str = 'strip'
+    bot_punitive_action: str = 'ban'
+    protect_bots: bool = True
+    allow_owner: bool = True
+
+    @classmethod
+    def from_config(cls, conf: Optional[dict[str, Any]]) -> "NukePolicy":
+        conf = conf or {}
+        thresholds = {
+            'channel_delete': _to_int(conf.get('channelDeleteLimit'), 3),
+            'role_delete': _to_int(conf.get('roleDeleteLimit'), 5),
+            'ban': _to_int(conf.get('banLimit'), 10),
+            'webhook': _to_int(conf.get('webhookCreateLimit'), 3),
+            'channel_update': _to_int(conf.get('channelUpdateLimit', conf.get('channelDeleteLimit')), 3),
+        }
+        return cls(
+            time_window=_to_int(conf.get('timeWindow') or conf.get('time_window'), 30),
+            audit_log_max_age=_to_int(conf.get('auditLogMaxAge'), 15),
+            thresholds=MappingProxyType(thresholds),
+            global_action_limit=_to_int(conf.get('globalActionLimit'), 4),
+            bot_action_limit=_to_int(conf.get('botActionLimit'), 1),
+            punitive_action=conf.get('punitiveAction', 'strip'),
+            bot_punitive_action=conf.get('botPunitiveAction', 'ban'),
+            protect_bots=bool(conf.get('protectBots', True)),
+            allow_owner=bool(conf.get('allowOwner', True)),
+        )
+
+    def threshold_for(self, action_type: str, bot_executor: bool) -> Optional[int]:
+        threshold = self.thresholds.get(action_type)
+        if bot_executor and self.protect_bots:
+            threshold = min(threshold or 1, self.bot_action_limit)
+        return threshold
+
+    def global_threshold_for(self, bot_executor: bool) -> int:
+        if bot_executor and self.protect_bots:
+            return min(self.global_action_limit, self.bot_action_limit)
+        return self.global_action_limit
+
+
+__all__ = ["NukePolicy", "RaidPolicy", "SlowModePolicy", "SlowModeTier"]
@@ -1,60 +1,142 @@
-import datetime
-from collections import defaultdict, deque
+import sys
+import time
 from typing import Any
 
 import discord
 
+from bot.policies import SlowModePolicy
+
+IDLE_SWEEP_INTERVAL = 300  # secondes entre deux purges des salons inactifs
+
+
+class MessageRateCounter:
+    """Compteurs par seconde sur une fenêtre glissante fixe (anneau de ``window`` cases).
+
+    Mise à jour et lecture du débit en O(1) amorti ; la mémoire ne dépend que
+    de la taille de la fenêtre, pas du nombre de messages.
+    """
+
+    __slots__ = ("window", "counts", "total", "last_second")
+
+    def __init__(self, window: int, now_second: int) -> None:
+        self.window = window
+        self.counts = [0] * window
+        self.total = 0
+        self.last_second = now_second
+
+    def _advance(self, now_second: int) -> None:
+        elapsed = now_second - self.last_second
+        if elapsed <= 0:
+            return
+        if elapsed >= self.window:
+            self.counts = [0] * self.window
+            self.total = 0
+        else:
+            counts = self.counts
+            for second in range(self.last_second + 1, now_second + 1):
+                idx = second % self.window
+                self.total -= counts[idx]
+                counts[idx] = 0
+        self.last_second = now_second
+
+    def add(self, now_second: int, amount: int = 1) -> None:
+        self._advance(now_second)
+        self.counts[now_second % self.window] += amount
+        self.total += amount
+
+    def rate_per_minute(self, now_second: int) -> float:
+        self._advance(now_second)
+        return (self.total / self.window) * 60
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.counts)
+
 
 class SlowModeManager:
     def __init__(self, bot: discord.Client, config: dict[str, Any]):
         self.bot = bot
-        self.message_buckets: dict[int, deque] = defaultdict(lambda: deque(maxlen=1000))
+        self.rates: dict[int, MessageRateCounter] = {}
         self.last_applied: dict[int, int] = {}
-        self.last_change: dict[int, datetime.datetime] = {}
+        self.last_change: dict[int, float] = {}
+        # Dernier edit évité par l'hystérésis, soumis au même délai minimal qu'un vrai edit
+        self.last_avoided: dict[int, float] = {}
+        self._last_sweep = time.monotonic()
+        self.evicted_channels = 0
+        self.edits_applied = 0
+        self.edits_avoided = 0
         self.update_config(config)
 
     def update_config(self, config: dict[str, Any]) -> None:
         self.config = (config or {}).get('slow_mode') or {}
+        self.policy = SlowModePolicy.from_config(self.config)
 
     def handle_message(self, message: discord.Message) -> None:
         if message.guild is None or message.author.bot:
             return
-        conf = self.config or {}
-        if not conf.get('enabled', False):
+        policy = self.policy
+        if not policy.enabled:
             return
-        now = datetime.datetime.utcnow()
-        bucket = self.message_buckets[message.channel.id]
-        bucket.append(now)
-        window = max(int(conf.get('window_seconds', 60)), 10)
-        while bucket and (now - bucket[0]).total_seconds() > window:
-            bucket.popleft()
-        rate = (len(bucket) / window) * 60
-        tiers = conf.get('tiers') or []
-        target = self._select_slowmode(rate, tiers)
+        now = time.monotonic()
+        now_second = int(now)
+        window = policy.window_seconds
+        counter = self.rates.get(message.channel.id)
+        if counter is None or counter.window != window:
+            counter = self.rates[message.channel.id] = MessageRateCounter(window, now_second)
+        counter.add(now_second)
+        rate = counter.rate_per_minute(now_second)
+        if now - self._last_sweep >= IDLE_SWEEP_INTERVAL:
+            self._evict_idle(now)
         last = self.last_applied.get(message.channel.id, 0)
-        cooldown = max(int(conf.get('min_update_interval_seconds', 15)), 5)
+        target = policy.select_from(rate, last)
+        cooldown = policy.min_update_interval_seconds
+        last_change = self.last_change.get(message.channel.id)
+        in_cooldown = bool(last_change) and now - last_change < cooldown
         if target == last:
+            last_avoided = self.last_avoided.get(message.channel.id)
+            if (
+                policy.select(rate) != last
+                and not in_cooldown
+                and not (last_avoided and now - last_avoided < cooldown)
+            ):
+                # Sans hystérésis, ce message aurait déclenché un channel.edit (hors délai minimal).
+                self.edits_avoided += 1
+                self.last_avoided[message.channel.id] = now
             return
-        last_change = self.last_change.get(message.channel.id)
-        if last_change and (now - last_change).total_seconds() < cooldown:
+        if in_cooldown:
             return
         if isinstance(message.channel, discord.TextChannel):
             try:
                 self.bot.loop.create_task(message.channel.edit(slowmode_delay=target, reason='Auto slow mode'))
                 self.last_applied[message.channel.id] = target
                 self.last_change[message.channel.id] = now
+                self.edits_applied += 1
             except Exception:
                 return
 
-    def _select_slowmode(self, rate_per_minute: float, tiers: list[dict[str, Any]]) -> int:
-        selected = 0
-        for tier in sorted(tiers, key=lambda t: t.get('threshold', 0), reverse=True):
-            try:
-                threshold = float(tier.get('threshold', 0))
-                seconds = int(tier.get('seconds', 0))
-            except (TypeError, ValueError):
-                continue
-            if rate_per_minute >= threshold:
-                selected = max(selected, max(seconds, 0))
-                break
-        return selected
+    def _evict_idle(self, now: float) -> None:
+        """Oublie les salons sans message depuis plus d'une fenêtre (compteurs tous à zéro)."""
+        self._last_sweep = now
+        now_second = int(now)
+        idle = [cid for cid, counter in self.rates.items() if now_second - counter.last_second >= counter.window]
+        for channel_id in idle:
+            del self.rates[channel_id]
+            # Le délai appliqué est conservé s'il est non nul : il reste en place sur le salon.
+            if not self.last_applied.get(channel_id):
+                self.last_applied.pop(channel_id, None)
+            last_change = self.last_change.get(channel_id)
+            if last_change is not None and now - last_change >= self.policy.min_update_interval_seconds:
+                self.last_change.pop(channel_id, None)
+            self.last_avoided.pop(channel_id, None)
+        self.evicted_channels += len(idle)
+
+    def memory_stats(self) -> dict[str, int]:
+        channel_bytes = sum(counter.memory_bytes() for counter in self.rates.values())
+        tracked = len(self.rates)
+        return {
+            "channels": tracked,
+            "bytes": channel_bytes + sys.getsizeof(self.rates),
+            "bytes_per_channel": channel_bytes // tracked if tracked else 0,
+            "evicted_channels": self.evicted_channels,
+            "edits_applied": self.edits_applied,
+            "edits_avoided": self.edits_avoided,
+        }
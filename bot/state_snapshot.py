@@ -0,0 +1,86 @@
+"""Instantané binaire de l'état chaud du bot (redémarrage à chaud).
+
+L'état est sérialisé avec pickle, compressé avec zlib puis écrit de façon
+atomique (fichier temporaire + ``os.replace``) sur le volume persistant.
+"""
+import logging
+import os
+import pickle
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = Path(os.getenv("SNAPSHOT_PATH", "/data/hot_state.snapshot"))
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "300"))
+_FORMAT_VERSION = 2
+
+
+def encode(state: dict[str, Any]) -> bytes:
+    """Sérialise l'état (à appeler depuis la boucle, pendant qu'il est cohérent)."""
+    return pickle.dumps(
+        {"version": _FORMAT_VERSION, "saved_at": time.time(), "state": state},
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+
+def write(payload: bytes, path: Path = SNAPSHOT_PATH, started: Optional[float] = None) -> bool:
+    """Compresse et écrit ``payload`` ; retourne False si l'écriture a échoué."""
+    started = time.perf_counter() if started is None else started
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        data = zlib.compress(payload, 6)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        logger.warning("Instantané non écrit (%s) : %s", path, exc)
+        return False
+    logger.info(
+        "Instantané écrit : %d octets (%d bruts) en %.1f ms",
+        len(data),
+        len(payload),
+        (time.perf_counter() - started) * 1000,
+    )
+    return True
+
+
+def save(state: dict[str, Any], path: Path = SNAPSHOT_PATH) -> bool:
+    started = time.perf_counter()
+    return write(encode(state), path, started)
+
+
+def load(path: Path = SNAPSHOT_PATH) -> Optional[dict[str, Any]]:
+    """Relit l'instantané ; retourne None s'il est absent, illisible ou d'un autre format."""
+    started = time.perf_counter()
+    try:
+        raw = path.read_bytes()
+    except FileNotFoundError:
+        logger.info("Aucun instantané à restaurer (%s).", path)
+        return None
+    except OSError as exc:
+        logger.warning("Instantané illisible (%s) : %s", path, exc)
+        return None
+    try:
+        envelope = pickle.loads(zlib.decompress(raw))
+    except Exception as exc:  # noqa: BLE001 - fichier tronqué ou corrompu
+        logger.warning("Instantané corrompu ignoré (%s) : %s", path, exc)
+        return None
+    if not isinstance(envelope, dict) or envelope.get("version") != _FORMAT_VERSION:
+        logger.warning("Instantané d'un format inconnu ignoré (%s).", path)
+        return None
+    logger.info(
+        "Instantané relu : %d octets, vieux de %.0f s, en %.1f ms",
+        len(raw),
+        time.time() - float(envelope.get("saved_at", 0)),
+        (time.perf_counter() - started) * 1000,
+    )
+    return envelope.get("state") or {}
+
+
+__all__ = ["SNAPSHOT_INTERVAL", "SNAPSHOT_PATH", "encode", "load", "save", "write"]
@@ -1,5 +1,5 @@
 import discord
-from database import db
+from database import async_db, db
 
 TRUST_LEVELS = {
     'OWNER': 'OWNER',
@@ -9,15 +9,17 @@ TRUST_LEVELS = {
 }
 
 
-def get_trust_level(user_id: str, guild: discord.Guild) -> str:
+async def get_trust_level(user_id: str, guild: discord.Guild) -> str:
     if guild and str(guild.owner_id) == str(user_id):
         return TRUST_LEVELS['OWNER']
-    mapping = db.get_trust_levels()
+    mapping = db.cached_trust_levels()
+    if mapping is None:
+        mapping = await async_db.get_trust_levels()
     return mapping.get(str(user_id), TRUST_LEVELS['DEFAULT_USER'])
 
 
-def is_trusted(user_id: str, guild: discord.Guild, allow_owner: bool = True) -> bool:
+async def is_trusted(user_id: str, guild: discord.Guild, allow_owner: bool = True) -> bool:
     if guild and str(guild.owner_id) == str(user_id):
         return allow_owner
-    level = get_trust_level(user_id, guild)
+    level = await get_trust_level(user_id, guild)
     return level in {TRUST_LEVELS['OWNER'], TRUST_LEVELS['TRUSTED_ADMIN']}
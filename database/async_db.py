@@ -0,0 +1,46 @@
+"""Async facade over :mod:`database.db` for the Discord bot.
+
+Each function mirrors its synchronous counterpart but runs in the bounded DB
+worker pool, so a Supabase round trip never blocks the gateway loop.
+"""
+from functools import wraps
+from typing import Any, Awaitable, Callable
+
+from database import db
+from database.worker_pool import run_blocking
+
+
+def _offload(fn: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    @wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return await run_blocking(fn, *args, **kwargs)
+
+    return wrapper
+
+
+# Logs / modération
+add_moderation_action = _offload(db.add_moderation_action)
+count_user_messages = _offload(db.count_user_messages)
+
+# Config
+load_config = _offload(db.load_config)
+save_config = _offload(db.save_config)
+get_config_version = _offload(db.get_config_version)
+get_trust_levels = _offload(db.get_trust_levels)
+set_trust_level = _offload(db.set_trust_level)
+remove_trust_level = _offload(db.remove_trust_level)
+
+# XP
+get_user_xp = _offload(db.get_user_xp)
+get_users_xp = _offload(db.get_users_xp)
+set_user_xp = _offload(db.set_user_xp)
+increment_user_xp = _offload(db.increment_user_xp)
+increment_user_xp_batch = _offload(db.increment_user_xp_batch)
+reset_guild_xp = _offload(db.reset_guild_xp)
+get_top_xp = _offload(db.get_top_xp)
+get_guild_xp = _offload(db.get_guild_xp)
+
+# Réactions
+get_reaction_counts = _offload(db.get_reaction_counts)
+increment_reaction_counts = _offload(db.increment_reaction_counts)
+get_top_reactions = _offload(db.get_top_reactions)
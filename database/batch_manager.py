@@ -1,17 +1,36 @@
 """Batch orchestration utilities for logs and daily stats."""
 import asyncio
 import atexit
+import logging
 import os
 import signal
 import threading
-from typing import Optional
+from typing import Callable, Optional
 
 from database import db
-from database.db import batch_logger, stats_cache
+from database.db import batch_logger, reaction_counter, stats_cache, xp_ledger
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_FLUSH_INTERVAL = int(os.getenv("FLUSH_INTERVAL", "60"))
 
 _flush_task: Optional[asyncio.Task] = None
+_shutdown_callbacks: list[Callable[[], None]] = []
+
+
+def register_shutdown_callback(callback: Callable[[], None]) -> None:
+    """Run ``callback`` on SIGINT/SIGTERM and at exit, before batches are flushed."""
+
+    if callback not in _shutdown_callbacks:
+        _shutdown_callbacks.append(callback)
+
+
+def run_shutdown_callbacks() -> None:
+    for callback in list(_shutdown_callbacks):
+        try:
+            callback()
+        except Exception:  # noqa: BLE001 - best effort during shutdown
+            logger.exception("Erreur dans un callback d'arrêt")
 
 
 def start_periodic_flush(loop: asyncio.AbstractEventLoop, interval: int = DEFAULT_FLUSH_INTERVAL) -> None:
@@ -36,13 +55,14 @@ def register_signal_handlers(loop: asyncio.AbstractEventLoop) -> None:
         return
 
     def _handler(*_: object) -> None:
+        run_shutdown_callbacks()
         asyncio.ensure_future(flush_all(), loop=loop)
 
     for sig in (signal.SIGINT, signal.SIGTERM):
         try:
             loop.add_signal_handler(sig, _handler)
         except NotImplementedError:  # pragma: no cover - Windows
-            signal.signal(sig, lambda *_: asyncio.run(flush_all()))
+            signal.signal(sig, lambda *_: (run_shutdown_callbacks(), asyncio.run(flush_all())))
 
 
 async def flush_all() -> None:
@@ -52,6 +72,7 @@ async def flush_all() -> None:
 def flush_all_sync() -> None:
     """Synchronously flush using a dedicated loop (atexit friendly)."""
 
+    run_shutdown_callbacks()
     try:
         loop = asyncio.get_running_loop()
     except RuntimeError:
@@ -72,8 +93,12 @@ atexit.register(flush_all_sync)
 __all__ = [
     "batch_logger",
     "stats_cache",
+    "xp_ledger",
+    "reaction_counter",
     "flush_all",
     "flush_all_sync",
+    "register_shutdown_callback",
     "register_signal_handlers",
+    "run_shutdown_callbacks",
     "start_periodic_flush",
 ]
@@ -4,13 +4,16 @@ import json
 import logging
 import os
 import threading
-from collections import defaultdict, deque
+import time
+from collections import OrderedDict, defaultdict, deque
 from datetime import datetime, date, timedelta
 from pathlib import Path
 from typing import Any, Iterable, Optional
 
 from database.supabase_client import get_supabase, test_connection
 from database.models import Config
+from database.rank_index import RankIndex
+from database.worker_pool import run_blocking
 
 logger = logging.getLogger(__name__)
 
@@ -56,7 +59,7 @@ class BatchLogger:
         batch = list(self.queue)
         self.queue.clear()
         try:
-            inserted = bulk_insert_logs(batch)
+            inserted = await run_blocking(bulk_insert_logs, batch)
             self.total_flushed += inserted
             return inserted
         except Exception as exc:  # pragma: no cover - defensive
@@ -117,7 +120,9 @@ class StatsCache:
                 client = _ensure_client()
                 if not client:
                     return 0
-                client.table("daily_stats").upsert(payload, on_conflict="date,guild_id").execute()
+                await run_blocking(
+                    lambda: client.table("daily_stats").upsert(payload, on_conflict="date,guild_id").execute()
+                )
                 self.flush_count += 1
                 return len(payload)
             except Exception as exc:  # pragma: no cover - defensive
@@ -125,9 +130,326 @@ class StatsCache:
                 return 0
 
 
+class XPLedger:
+    """Write-behind cache of user XP keyed by (guild_id, user_id).
+
+    Deltas are applied in memory and accumulated per user; each flush sends them
+    as one atomic ``increment_user_xp_batch`` call and reconciles the cached
+    totals with the values returned by the server. Every change is mirrored
+    into ``ranks`` so leaderboard positions are answered locally.
+
+    Cached rows are bounded: an entry with no pending delta is re-read after
+    ``XP_ENTRY_TTL`` seconds (to pick up writes made directly in the database)
+    and the least recently used ones are evicted beyond ``XP_LEDGER_MAX_ENTRIES``.
+    """
+
+    def __init__(self) -> None:
+        # (guild_id, user_id) -> {user_name, xp, loaded_at}, in LRU order
+        self.entries: OrderedDict[tuple[str, str], dict[str, Any]] = OrderedDict()
+        self.pending: dict[tuple[str, str], dict[str, Any]] = {}
+        self.ranks = RankIndex()
+        self._rank_loads: dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.total_flushed = 0
+        self.last_flushed = 0
+        self.evicted = 0
+
+    def _cached(self, key: tuple[str, str]) -> Optional[dict[str, Any]]:
+        """Cached entry of ``key`` unless it expired (entries with a pending delta never expire)."""
+
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if key not in self.pending and time.monotonic() - entry["loaded_at"] >= XP_ENTRY_TTL:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: tuple[str, str], row: dict[str, Any]) -> dict[str, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {
+                "user_name": row.get("user_name") or key[1],
+                "xp": int(row.get("xp", 0) or 0),
+                "loaded_at": time.monotonic(),
+            }
+        return entry
+
+    async def get(self, guild_id: str, user_id: str) -> dict[str, Any]:
+        """Return the current XP row, loading it from storage on first access."""
+
+        key = (guild_id, user_id)
+        entry = self._cached(key)
+        if entry is None:
+            row = await run_blocking(get_user_xp, guild_id, user_id)
+            entry = self._store(key, row)
+        return {"user_id": user_id, "user_name": entry["user_name"], "xp": entry["xp"]}
+
+    async def prime(self, guild_id: str, user_ids: Iterable[str]) -> None:
+        """Load every uncached row of ``user_ids`` with a single bulk read."""
+
+        missing = [user_id for user_id in dict.fromkeys(user_ids) if self._cached((guild_id, user_id)) is None]
+        if not missing:
+            return
+        rows = await run_blocking(get_users_xp, guild_id, missing)
+        for user_id in missing:
+            self._store((guild_id, user_id), rows.get(user_id, {}))
+
+    async def add_many(
+        self,
+        guild_id: str,
+        grants: Iterable[tuple[str, str, int]],
+        max_xp: Optional[int] = None,
+    ) -> list[tuple[int, int]]:
+        """Apply several ``(user_id, user_name, delta)`` grants of one guild; returns (old, new) per grant."""
+
+        grants = list(grants)
+        await self.prime(guild_id, [user_id for user_id, _name, _delta in grants])
+        return [await self.add(guild_id, user_id, name, delta, max_xp) for user_id, name, delta in grants]
+
+    async def add(
+        self,
+        guild_id: str,
+        user_id: str,
+        user_name: str,
+        delta: int,
+        max_xp: Optional[int] = None,
+    ) -> tuple[int, int]:
+        """Apply ``delta`` in memory (floored at 0, capped at ``max_xp``) and return (old, new)."""
+
+        current = (await self.get(guild_id, user_id))["xp"]
+        new_xp = _apply_xp_delta(current, delta, max_xp)
+        key = (guild_id, user_id)
+        entry = self._store(key, {"user_name": user_name, "xp": current})
+        entry["user_name"] = user_name
+        entry["xp"] = new_xp
+        if new_xp != current:
+            self._queue(key, user_name, new_xp - current, max_xp)
+            self.ranks.update(guild_id, user_id, new_xp)
+        return current, new_xp
+
+    async def rank(self, guild_id: str, user_id: str) -> tuple[Optional[int], int]:
+        """Return (rank, total ranked) in the guild, loading its rank index on demand.
+
+        The index is rebuilt every ``RANK_INDEX_TTL`` seconds to pick up writes
+        made outside the bot (dashboard, manual edits).
+        """
+
+        if not self.ranks.is_loaded(guild_id, RANK_INDEX_TTL):
+            task = self._rank_loads.get(guild_id)
+            if task is None:
+                task = asyncio.ensure_future(self._load_ranks(guild_id))
+                self._rank_loads[guild_id] = task
+                task.add_done_callback(lambda _: self._rank_loads.pop(guild_id, None))
+            await asyncio.shield(task)
+        return self.ranks.rank(guild_id, user_id)
+
+    async def _load_ranks(self, guild_id: str) -> None:
+        # Une erreur de lecture remonte : la guilde reste non chargée et la requête suivante réessaie.
+        rows = await run_blocking(get_guild_xp, guild_id)
+        self.ranks.load(guild_id, rows)
+        # Les valeurs en mémoire (pas encore flushées) priment sur la base ; un membre
+        # à 0 XP sans ligne en base n'est pas classé.
+        for (entry_guild, entry_user), entry in list(self.entries.items()):
+            if entry_guild != guild_id:
+                continue
+            if entry["xp"] > 0 or self.ranks.contains(guild_id, entry_user):
+                self.ranks.update(guild_id, entry_user, entry["xp"])
+
+    def _queue(self, key: tuple[str, str], user_name: str, delta: int, cap: Optional[int]) -> None:
+        pending = self.pending.get(key)
+        if pending is None:
+            self.pending[key] = {"user_name": user_name, "delta": delta, "cap": cap}
+            return
+        pending["user_name"] = user_name
+        pending["delta"] += delta
+        if cap is not None:
+            pending["cap"] = cap if pending["cap"] is None else min(pending["cap"], cap)
+
+    def forget_guild(self, guild_id: str) -> None:
+        """Drop every cached row and pending delta of a guild (around a full XP reset)."""
+
+        for key in [key for key in self.entries if key[0] == guild_id]:
+            self.entries.pop(key, None)
+        for key in [key for key in self.pending if key[0] == guild_id]:
+            self.pending.pop(key, None)
+        self.ranks.drop(guild_id)
+
+    async def reset_guild(self, guild_id: str) -> int:
+        """Reset a guild's XP in the database; returns the number of rows removed.
+
+        Runs under the flush lock so an in-flight flush cannot re-apply deltas
+        after the reset.
+        """
+
+        async with self._lock:
+            self.forget_guild(guild_id)
+            removed = await run_blocking(reset_guild_xp, guild_id)
+            # Rows may have been re-read (and deltas queued) while the reset ran.
+            self.forget_guild(guild_id)
+            return removed
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self.pending:
+                self._evict()
+                self.last_flushed = 0
+                return 0
+            batch, self.pending = self.pending, {}
+            items = [
+                (guild_id, user_id, data["user_name"], data["delta"], data["cap"])
+                for (guild_id, user_id), data in batch.items()
+            ]
+            try:
+                rows = await run_blocking(increment_user_xp_batch, items)
+            except Exception as exc:  # pragma: no cover - defensive
+                self.failed_flushes += 1
+                logger.error("Erreur lors du flush XP: %s", exc)
+                for key, data in batch.items():
+                    self._queue(key, data["user_name"], data["delta"], data["cap"])
+                return 0
+            for row in rows:
+                key = (str(row["guild_id"]), str(row["user_id"]))
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                # Le serveur fait foi ; on ré-applique ce qui a été accumulé pendant le flush.
+                still_pending = self.pending.get(key, {}).get("delta", 0)
+                entry["xp"] = max(0, row["xp"] + still_pending)
+                entry["loaded_at"] = time.monotonic()
+                self.ranks.update(key[0], key[1], entry["xp"])
+            self._evict()
+            self.flush_count += 1
+            self.total_flushed += len(items)
+            self.last_flushed = len(items)
+            logger.info("Flush XP : %d ligne(s) écrite(s) en une requête.", len(items))
+            return len(items)
+
+    def _evict(self) -> None:
+        """Drop expired rows, then the least recently used ones beyond the size bound."""
+
+        now = time.monotonic()
+        overflow = len(self.entries) - XP_LEDGER_MAX_ENTRIES
+        for key in list(self.entries):
+            if key in self.pending:
+                continue
+            if overflow > 0 or now - self.entries[key]["loaded_at"] >= XP_ENTRY_TTL:
+                del self.entries[key]
+                overflow -= 1
+                self.evicted += 1
+
+
+class ReactionCounter:
+    """Received-reaction counts accumulated per (guild_id, user_id).
+
+    Each reaction only bumps an in-memory counter; flushes send the deltas as
+    one additive ``increment_reaction_counts`` batch, so concurrent reactions
+    never overwrite each other. Leaderboards merge persisted and pending counts.
+    """
+
+    def __init__(self) -> None:
+        self.pending: dict[tuple[str, str], dict[str, Any]] = {}
+        self._in_flight: dict[tuple[str, str], dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.total_flushed = 0
+        self.last_flushed = 0
+
+    def increment(self, guild_id: str, user_id: str, user_name: str, amount: int = 1) -> None:
+        key = (guild_id, user_id)
+        pending = self.pending.get(key)
+        if pending is None:
+            self.pending[key] = {"user_name": user_name, "count": amount}
+            return
+        pending["user_name"] = user_name
+        pending["count"] += amount
+
+    def pending_for_guild(self, guild_id: str) -> dict[str, dict[str, Any]]:
+        """Counts not yet persisted (queued or being flushed) for one guild."""
+
+        merged: dict[str, dict[str, Any]] = {}
+        for source in (self._in_flight, self.pending):
+            for (entry_guild, user_id), data in source.items():
+                if entry_guild != guild_id:
+                    continue
+                entry = merged.setdefault(user_id, {"user_name": data["user_name"], "count": 0})
+                entry["user_name"] = data["user_name"]
+                entry["count"] += data["count"]
+        return merged
+
+    async def top(self, guild_id: str, limit: int = 10) -> list[dict[str, Any]]:
+        """Leaderboard over persisted + pending counts.
+
+        Pending counts only ever raise a user's total, so the persisted top
+        ``limit`` plus the persisted counts of pending users are enough.
+        """
+
+        pending = self.pending_for_guild(guild_id)
+        top_rows, pending_rows = await asyncio.gather(
+            run_blocking(get_top_reactions, guild_id, limit),
+            run_blocking(get_reaction_counts, guild_id, list(pending)),
+        )
+        merged: dict[str, dict[str, Any]] = {}
+        for row in list(top_rows) + list(pending_rows.values()):
+            user_id = str(row.get("user_id"))
+            merged[user_id] = {
+                "user_id": user_id,
+                "user_name": row.get("user_name") or user_id,
+                "count": int(row.get("count") or 0),
+            }
+        for user_id, data in pending.items():
+            entry = merged.setdefault(user_id, {"user_id": user_id, "user_name": data["user_name"], "count": 0})
+            entry["user_name"] = data["user_name"]
+            entry["count"] += data["count"]
+        return sorted(merged.values(), key=lambda row: row["count"], reverse=True)[:limit]
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self.pending:
+                self.last_flushed = 0
+                return 0
+            if not _ensure_client():
+                # Sans Supabase les compteurs ne sont pas persistés (comme avant) :
+                # on les abandonne plutôt que de les accumuler sans fin.
+                logger.debug("Supabase indisponible : %d compteur(s) de réactions abandonné(s).", len(self.pending))
+                self.pending = {}
+                self.last_flushed = 0
+                return 0
+            batch, self.pending = self.pending, {}
+            self._in_flight = batch
+            items = [
+                (guild_id, user_id, data["user_name"], data["count"])
+                for (guild_id, user_id), data in batch.items()
+            ]
+            try:
+                await run_blocking(increment_reaction_counts, items)
+            except Exception as exc:  # pragma: no cover - defensive
+                self.failed_flushes += 1
+                logger.error("Erreur lors du flush des réactions: %s", exc)
+                for (guild_id, user_id), data in batch.items():
+                    self.increment(guild_id, user_id, data["user_name"], data["count"])
+                return 0
+            finally:
+                self._in_flight = {}
+            self.flush_count += 1
+            self.total_flushed += len(items)
+            self.last_flushed = len(items)
+            logger.info("Flush réactions : %d compteur(s) écrit(s) en une requête.", len(items))
+            return len(items)
+
+
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", "200"))
+RANK_INDEX_TTL = int(os.getenv("RANK_INDEX_TTL", "3600"))
+XP_ENTRY_TTL = int(os.getenv("XP_ENTRY_TTL", "600"))
+XP_LEDGER_MAX_ENTRIES = int(os.getenv("XP_LEDGER_MAX_ENTRIES", "50000"))
 batch_logger = BatchLogger(batch_size=BATCH_SIZE)
 stats_cache = StatsCache()
+xp_ledger = XPLedger()
+reaction_counter = ReactionCounter()
 
 
 def init_db() -> None:
@@ -619,6 +941,31 @@ def load_config() -> Config:
         return Config()
 
 
+CONFIG_VERSION_KEY = "config_version"
+
+
+def get_config_version() -> Optional[str]:
+    """Version stamp written by :func:`save_config`; cheap to poll compared to a full load."""
+
+    client = _ensure_client()
+    if not client:
+        return None
+    try:
+        rows = (
+            client.table("config")
+            .select("value")
+            .eq("key", CONFIG_VERSION_KEY)
+            .limit(1)
+            .execute()
+            .data
+            or []
+        )
+        return str(rows[0].get("value")) if rows else None
+    except Exception as exc:
+        logger.error("Erreur get_config_version: %s", exc)
+        return None
+
+
 def save_config(config: Config) -> None:
     client = _ensure_client()
     if not client:
@@ -626,21 +973,60 @@ def save_config(config: Config) -> None:
     payload = []
     for key, value in config.to_dict().items():
         payload.append({"key": key, "value": value})
+    payload.append({"key": CONFIG_VERSION_KEY, "value": str(time.time_ns())})
     try:
         client.table("config").upsert(payload, on_conflict="key").execute()
     except Exception as exc:
         logger.error("Erreur save_config: %s", exc)
+    finally:
+        invalidate_trust_levels()
 
 
 async def flush_all() -> None:
-    """Flush batched logs and stats for a graceful shutdown."""
+    """Flush batched logs, stats, XP and reaction counters for a graceful shutdown."""
+
+    await asyncio.gather(
+        batch_logger.flush(),
+        stats_cache.flush(),
+        xp_ledger.flush(),
+        reaction_counter.flush(),
+    )
+
 
-    await asyncio.gather(batch_logger.flush(), stats_cache.flush())
+TRUST_LEVELS_TTL = int(os.getenv("TRUST_LEVELS_TTL", "300"))
+_trust_levels_cache: Optional[tuple[float, dict[str, str]]] = None
+_TRUST_LEVELS_LOCK = threading.Lock()
+
+
+def cached_trust_levels() -> Optional[dict[str, str]]:
+    """Trust levels from the in-process cache, or None when absent or stale."""
+
+    cached = _trust_levels_cache
+    if cached is None or time.monotonic() - cached[0] >= TRUST_LEVELS_TTL:
+        return None
+    return cached[1]
+
+
+def invalidate_trust_levels() -> None:
+    global _trust_levels_cache
+    _trust_levels_cache = None
 
 
 def get_trust_levels() -> dict[str, str]:
-    config = load_config()
-    return config.to_dict().get("trust_levels", {}) or {}
+    """Return the trust levels mapping (read-only), loading the config at most once per TTL."""
+
+    global _trust_levels_cache
+    cached = cached_trust_levels()
+    if cached is not None:
+        return cached
+    # Un seul chargement même si 500 arrivées concurrentes trouvent le cache vide.
+    with _TRUST_LEVELS_LOCK:
+        cached = cached_trust_levels()
+        if cached is not None:
+            return cached
+        levels = dict(load_config().to_dict().get("trust_levels", {}) or {})
+        _trust_levels_cache = (time.monotonic(), levels)
+        return levels
 
 
 def set_trust_level(user_id: str, level: str) -> None:
@@ -664,6 +1050,8 @@ _LOCAL_CREDITS_LOCK = threading.Lock()
 _LOCAL_XP_PATH = Path(__file__).with_name("local_xp.json")
 _LOCAL_XP_LOCK = threading.Lock()
 _LOCAL_XP_MIGRATED = False
+# RPC absentes de la base (détectées au premier appel) : on passe directement au repli.
+_MISSING_RPCS: set[str] = set()
 
 
 def _load_local_credits() -> dict[str, Any]:
@@ -991,6 +1379,56 @@ def get_user_xp(guild_id: str, user_id: str) -> dict[str, Any]:
         return _get_local_user_xp(guild_id, user_id)
 
 
+def get_users_xp(guild_id: str, user_ids: Iterable[str]) -> dict[str, dict[str, Any]]:
+    """Bulk version of :func:`get_user_xp`; users without a row are absent from the result."""
+
+    ids = [str(user_id) for user_id in user_ids]
+    if not ids:
+        return {}
+    client = _ensure_client()
+    if not client:
+        return _get_local_users_xp(guild_id, ids)
+    _migrate_local_xp_to_supabase()
+    results: dict[str, dict[str, Any]] = {}
+    try:
+        for start in range(0, len(ids), 200):
+            rows = (
+                client.table("user_xp")
+                .select("user_id,user_name,xp")
+                .eq("guild_id", guild_id)
+                .in_("user_id", ids[start:start + 200])
+                .execute()
+                .data
+                or []
+            )
+            for row in rows:
+                user_id = str(row.get("user_id"))
+                results[user_id] = {
+                    "user_id": user_id,
+                    "user_name": row.get("user_name") or user_id,
+                    "xp": int(row.get("xp", 0) or 0),
+                }
+        return results
+    except Exception as exc:
+        logger.error("Erreur get_users_xp: %s", exc)
+        return _get_local_users_xp(guild_id, ids)
+
+
+def _get_local_users_xp(guild_id: str, user_ids: list[str]) -> dict[str, dict[str, Any]]:
+    with _LOCAL_XP_LOCK:
+        data = _load_local_xp()
+    users = data.get("xp", {}).get(guild_id, {})
+    return {
+        user_id: {
+            "user_id": user_id,
+            "user_name": users[user_id].get("user_name") or user_id,
+            "xp": int(users[user_id].get("xp", 0) or 0),
+        }
+        for user_id in user_ids
+        if user_id in users
+    }
+
+
 def set_user_xp(guild_id: str, user_id: str, user_name: str, xp: int) -> int:
     client = _ensure_client()
     if not client:
@@ -1025,9 +1463,122 @@ def set_user_xp(guild_id: str, user_id: str, user_name: str, xp: int) -> int:
 
 
 def increment_user_xp(guild_id: str, user_id: str, user_name: str, delta: int) -> int:
-    current = get_user_xp(guild_id, user_id)
-    next_value = max(0, int(current.get("xp", 0)) + int(delta))
-    return set_user_xp(guild_id, user_id, user_name, next_value)
+    rows = increment_user_xp_batch([(guild_id, user_id, user_name, delta, None)])
+    return rows[-1]["xp"] if rows else 0
+
+
+XPDelta = tuple[str, str, str, int, Optional[int]]
+
+
+def _apply_xp_delta(xp: int, delta: int, cap: Optional[int]) -> int:
+    new_xp = max(0, int(xp) + int(delta))
+    return min(int(cap), new_xp) if cap is not None else new_xp
+
+
+def increment_user_xp_batch(items: Iterable[XPDelta]) -> list[dict[str, Any]]:
+    """Atomically apply a batch of ``(guild_id, user_id, user_name, delta, cap)`` XP deltas.
+
+    Each new total is ``min(cap, max(0, xp + delta))`` (no cap when ``cap`` is None).
+    Supabase applies the whole batch server-side through the
+    ``increment_user_xp_batch`` RPC. Returns one ``{guild_id, user_id, xp}`` row per
+    item, in order, so callers can detect level-ups without a separate read.
+
+    The local store is only used when no Supabase client is configured; when
+    the client exists and both the RPC and the fallback fail, the error is
+    raised so the caller can keep the deltas for the next flush.
+    """
+
+    items = [(str(g), str(u), name, int(delta), cap) for g, u, name, delta, cap in items]
+    if not items:
+        return []
+    client = _ensure_client()
+    if not client:
+        return _increment_local_xp_batch(items)
+
+    _migrate_local_xp_to_supabase()
+    payload = [
+        {"guild_id": g, "user_id": u, "user_name": name, "delta": delta, "cap": cap}
+        for g, u, name, delta, cap in items
+    ]
+    if "increment_user_xp_batch" not in _MISSING_RPCS:
+        try:
+            resp = client.rpc("increment_user_xp_batch", {"items": payload}).execute()
+            return [
+                {"guild_id": row.get("guild_id"), "user_id": row.get("user_id"), "xp": int(row.get("xp", 0) or 0)}
+                for row in (resp.data or [])
+            ]
+        except Exception as exc:
+            if _is_missing_rpc(exc):
+                _MISSING_RPCS.add("increment_user_xp_batch")
+                logger.warning("RPC increment_user_xp_batch absente, repli lecture/écriture groupée (voir README).")
+            else:
+                logger.error("Erreur RPC increment_user_xp_batch, repli lecture/écriture groupée: %s", exc)
+
+    # Pas de repli sur local_xp.json ici : ce fichier stocke des totaux absolus et
+    # écraserait la base à la migration. L'erreur remonte, l'appelant garde ses deltas.
+    return _increment_user_xp_batch_fallback(client, items)
+
+
+def _is_missing_rpc(exc: Exception) -> bool:
+    text = str(exc)
+    return "PGRST202" in text or "Could not find the function" in text
+
+
+def _increment_user_xp_batch_fallback(client, items: list[XPDelta]) -> list[dict[str, Any]]:
+    """Non-atomic fallback when the RPC is missing: one bulk read, one bulk upsert."""
+
+    totals: dict[tuple[str, str], int] = {}
+    by_guild: dict[str, set[str]] = defaultdict(set)
+    for g, u, _name, _delta, _cap in items:
+        by_guild[g].add(u)
+    for guild_id, user_ids in by_guild.items():
+        rows = (
+            client.table("user_xp")
+            .select("user_id,xp")
+            .eq("guild_id", guild_id)
+            .in_("user_id", list(user_ids))
+            .execute()
+            .data
+            or []
+        )
+        for row in rows:
+            totals[(guild_id, str(row.get("user_id")))] = int(row.get("xp", 0) or 0)
+
+    results, upserts = _fold_xp_deltas(items, totals)
+    client.table("user_xp").upsert(list(upserts.values()), on_conflict="guild_id,user_id").execute()
+    return results
+
+
+def _increment_local_xp_batch(items: list[XPDelta]) -> list[dict[str, Any]]:
+    with _LOCAL_XP_LOCK:
+        data = _load_local_xp()
+        xp_map = data.setdefault("xp", {})
+        totals = {
+            (g, u): int(xp_map.get(g, {}).get(u, {}).get("xp", 0) or 0)
+            for g, u, _name, _delta, _cap in items
+        }
+        results, upserts = _fold_xp_deltas(items, totals)
+        for row in upserts.values():
+            xp_map.setdefault(row["guild_id"], {})[row["user_id"]] = {
+                "user_name": row["user_name"],
+                "xp": row["xp"],
+            }
+        _save_local_xp(data)
+    return results
+
+
+def _fold_xp_deltas(
+    items: list[XPDelta],
+    totals: dict[tuple[str, str], int],
+) -> tuple[list[dict[str, Any]], dict[tuple[str, str], dict[str, Any]]]:
+    results = []
+    upserts: dict[tuple[str, str], dict[str, Any]] = {}
+    for g, u, name, delta, cap in items:
+        new_xp = _apply_xp_delta(totals.get((g, u), 0), delta, cap)
+        totals[(g, u)] = new_xp
+        results.append({"guild_id": g, "user_id": u, "xp": new_xp})
+        upserts[(g, u)] = {"guild_id": g, "user_id": u, "user_name": name, "xp": new_xp}
+    return results, upserts
 
 
 def reset_guild_xp(guild_id: str) -> int:
@@ -1065,6 +1616,49 @@ def reset_guild_xp(guild_id: str) -> int:
     return removed
 
 
+def get_guild_xp(guild_id: str, page_size: int = 1000) -> list[tuple[str, int]]:
+    """Return every ``(user_id, xp)`` pair of a guild, paging through Supabase.
+
+    Query errors are raised so callers can retry instead of caching a partial list.
+    """
+
+    client = _ensure_client()
+    if not client:
+        return _get_local_guild_xp(guild_id)
+    _migrate_local_xp_to_supabase()
+    rows: list[tuple[str, int]] = []
+    try:
+        start = 0
+        while True:
+            page = (
+                client.table("user_xp")
+                .select("user_id,xp")
+                .eq("guild_id", guild_id)
+                .order("user_id")
+                .range(start, start + page_size - 1)
+                .execute()
+                .data
+                or []
+            )
+            rows.extend((str(row.get("user_id")), int(row.get("xp", 0) or 0)) for row in page)
+            if len(page) < page_size:
+                return rows
+            start += page_size
+    except Exception as exc:
+        # Pas de repli local : un index de rangs vide serait mis en cache pour tout le TTL.
+        logger.error("Erreur get_guild_xp: %s", exc)
+        raise
+
+
+def _get_local_guild_xp(guild_id: str) -> list[tuple[str, int]]:
+    with _LOCAL_XP_LOCK:
+        data = _load_local_xp()
+    return [
+        (user_id, int(values.get("xp", 0) or 0))
+        for user_id, values in data.get("xp", {}).get(guild_id, {}).items()
+    ]
+
+
 def get_top_xp(guild_id: str, limit: int = 10) -> list[dict[str, Any]]:
     client = _ensure_client()
     if not client:
@@ -1151,3 +1745,96 @@ def export_table(table: str) -> Iterable[dict]:
     except Exception as exc:
         logger.error("Erreur export_table: %s", exc)
         return []
+
+
+# SECTION 9 - REACTIONS
+
+ReactionDelta = tuple[str, str, str, int]
+
+
+def get_reaction_counts(guild_id: str, user_ids: Iterable[str]) -> dict[str, dict[str, Any]]:
+    """Persisted counts of ``user_ids``; users without a row are absent from the result."""
+
+    ids = [str(user_id) for user_id in user_ids]
+    if not ids:
+        return {}
+    client = _ensure_client()
+    if not client:
+        return {}
+    results: dict[str, dict[str, Any]] = {}
+    try:
+        for start in range(0, len(ids), 200):
+            rows = (
+                client.table("reaction_counts")
+                .select("user_id,user_name,count")
+                .eq("guild_id", guild_id)
+                .in_("user_id", ids[start:start + 200])
+                .execute()
+                .data
+                or []
+            )
+            for row in rows:
+                results[str(row.get("user_id"))] = row
+        return results
+    except Exception as exc:
+        logger.error("Erreur get_reaction_counts: %s", exc)
+        return {}
+
+
+def increment_reaction_counts(items: Iterable[ReactionDelta]) -> None:
+    """Add a batch of ``(guild_id, user_id, user_name, delta)`` to ``reaction_counts``.
+
+    Uses the additive ``increment_reaction_counts`` RPC; without it, falls back
+    to one bulk read and one bulk upsert per guild. Errors are raised so the
+    caller can keep the deltas for the next flush.
+    """
+
+    items = [(str(g), str(u), name, int(delta)) for g, u, name, delta in items]
+    if not items:
+        return
+    client = _ensure_client()
+    if not client:
+        raise RuntimeError("Supabase indisponible")
+    payload = [
+        {"guild_id": g, "user_id": u, "user_name": name, "delta": delta}
+        for g, u, name, delta in items
+    ]
+    try:
+        client.rpc("increment_reaction_counts", {"items": payload}).execute()
+        return
+    except Exception as exc:
+        logger.error("Erreur RPC increment_reaction_counts, repli lecture/écriture groupée: %s", exc)
+
+    by_guild: dict[str, list[ReactionDelta]] = defaultdict(list)
+    for item in items:
+        by_guild[item[0]].append(item)
+    for guild_id, guild_items in by_guild.items():
+        current = get_reaction_counts(guild_id, [u for _g, u, _name, _delta in guild_items])
+        upserts: dict[str, dict[str, Any]] = {}
+        for _g, user_id, name, delta in guild_items:
+            base = upserts.get(user_id, {}).get("count")
+            if base is None:
+                base = int(current.get(user_id, {}).get("count") or 0)
+            upserts[user_id] = {"guild_id": guild_id, "user_id": user_id, "user_name": name, "count": base + delta}
+        client.table("reaction_counts").upsert(
+            list(upserts.values()), on_conflict="guild_id,user_id"
+        ).execute()
+
+
+def get_top_reactions(guild_id: str, limit: int = 10) -> list[dict[str, Any]]:
+    client = _ensure_client()
+    if not client:
+        return []
+    try:
+        resp = (
+            client.table("reaction_counts")
+            .select("user_id,user_name,count")
+            .eq("guild_id", guild_id)
+            .order("count", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return resp.data or []
+    except Exception as exc:
+        logger.error("Erreur get_top_reactions: %s", exc)
+        return []
@@ -26,6 +26,9 @@ class Config:
             'enabled': True,
             'window_seconds': 60,
             'min_update_interval_seconds': 15,
+            # Un palier n'est quitté vers le bas que sous `threshold * hysteresis`
+            # (ou sous son `down_threshold` s'il est précisé).
+            'hysteresis': 0.8,
             'tiers': [
                 {'threshold': 60, 'seconds': 10},
                 {'threshold': 30, 'seconds': 5},
@@ -101,8 +104,11 @@ def _normalize_slow_mode(data: Any) -> dict[str, Any]:
         min_update_interval_seconds = int(
             data.get('min_update_interval_seconds', default['min_update_interval_seconds'])
         )
+        hysteresis = float(data.get('hysteresis', default['hysteresis']))
     except (TypeError, ValueError):
         return default
+    if not 0 < hysteresis <= 1:
+        hysteresis = default['hysteresis']
 
     tiers = []
     for tier in data.get('tiers', []) or []:
@@ -113,7 +119,14 @@ def _normalize_slow_mode(data: Any) -> dict[str, Any]:
             continue
         if threshold <= 0 or seconds < 0:
             continue
-        tiers.append({'threshold': threshold, 'seconds': seconds})
+        normalized = {'threshold': threshold, 'seconds': seconds}
+        try:
+            down_threshold = float(tier['down_threshold'])
+        except (KeyError, TypeError, ValueError):
+            down_threshold = None
+        if down_threshold is not None and 0 < down_threshold <= threshold:
+            normalized['down_threshold'] = down_threshold
+        tiers.append(normalized)
 
     if not tiers:
         tiers = default['tiers']
@@ -122,6 +135,7 @@ def _normalize_slow_mode(data: Any) -> dict[str, Any]:
         'enabled': enabled,
         'window_seconds': max(10, min(window_seconds, 600)),
         'min_update_interval_seconds': max(5, min(min_update_interval_seconds, 600)),
+        'hysteresis': hysteresis,
         'tiers': tiers,
     }
 
@@ -0,0 +1,67 @@
+"""Per-guild order-statistic index over XP totals.
+
+Keeps every member of a loaded guild in a sorted container ordered by
+(XP desc, user_id), so "rank of user X / total ranked" is an O(log n)
+lookup with no network call.
+"""
+import time
+from typing import Iterable, Optional
+
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    def __init__(self) -> None:
+        self._ranked: dict[str, SortedList] = {}
+        self._xp: dict[str, dict[str, int]] = {}
+        self._loaded_at: dict[str, float] = {}
+
+    def is_loaded(self, guild_id: str, max_age: Optional[float] = None) -> bool:
+        if guild_id not in self._ranked:
+            return False
+        return max_age is None or time.monotonic() - self._loaded_at[guild_id] < max_age
+
+    def load(self, guild_id: str, rows: Iterable[tuple[str, int]]) -> None:
+        """(Re)build the index of a guild from ``(user_id, xp)`` pairs."""
+
+        xp_map = {str(user_id): int(xp) for user_id, xp in rows}
+        self._xp[guild_id] = xp_map
+        self._ranked[guild_id] = SortedList((-xp, user_id) for user_id, xp in xp_map.items())
+        self._loaded_at[guild_id] = time.monotonic()
+
+    def update(self, guild_id: str, user_id: str, xp: int) -> None:
+        """Record a new XP total; ignored for guilds that are not loaded yet."""
+
+        ranked = self._ranked.get(guild_id)
+        if ranked is None:
+            return
+        xp_map = self._xp[guild_id]
+        previous = xp_map.get(user_id)
+        if previous == xp:
+            return
+        if previous is not None:
+            ranked.remove((-previous, user_id))
+        ranked.add((-xp, user_id))
+        xp_map[user_id] = xp
+
+    def contains(self, guild_id: str, user_id: str) -> bool:
+        return user_id in self._xp.get(guild_id, ())
+
+    def drop(self, guild_id: str) -> None:
+        self._ranked.pop(guild_id, None)
+        self._xp.pop(guild_id, None)
+        self._loaded_at.pop(guild_id, None)
+
+    def rank(self, guild_id: str, user_id: str) -> tuple[Optional[int], int]:
+        """Return (1-based rank or None if unranked, number of ranked members)."""
+
+        ranked = self._ranked.get(guild_id)
+        if ranked is None:
+            return None, 0
+        xp = self._xp[guild_id].get(user_id)
+        if xp is None:
+            return None, len(ranked)
+        return ranked.index((-xp, user_id)) + 1, len(ranked)
+
+    def __len__(self) -> int:
+        return sum(len(ranked) for ranked in self._ranked.values())
@@ -0,0 +1,105 @@
+"""Bounded worker pool keeping blocking Supabase calls off the Discord event loop."""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DB_WORKERS = max(1, int(os.getenv("DB_WORKERS", "4")))
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+LOOP_LAG_WARN_SECONDS = float(os.getenv("LOOP_LAG_WARN_MS", "250")) / 1000
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db-worker")
+_monitor_task: Optional[asyncio.Task] = None
+
+
+class PoolStats:
+    """Counters for the DB pool and for the time the event loop spent blocked."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.loop_blocked_seconds = 0.0
+        self.loop_max_lag = 0.0
+
+    def record_start(self, waited: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.wait_seconds += waited
+
+    def record_end(self, ran: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.run_seconds += ran
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "workers": DB_WORKERS,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "run_seconds": round(self.run_seconds, 3),
+            "loop_blocked_seconds": round(self.loop_blocked_seconds, 3),
+            "loop_max_lag_ms": round(self.loop_max_lag * 1000, 1),
+        }
+
+
+stats = PoolStats()
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run ``fn`` in the DB pool and await its result."""
+
+    submitted = time.perf_counter()
+
+    def _call() -> T:
+        started = time.perf_counter()
+        stats.record_start(started - submitted)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stats.record_end(time.perf_counter() - started)
+
+    loop = asyncio.get_running_loop()
+    try:
+        future = loop.run_in_executor(_executor, _call)
+    except RuntimeError:
+        # Pool already shut down (interpreter exit): run inline as a last resort.
+        return _call()
+    return await future
+
+
+async def _monitor_loop_lag(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = loop.time() - start - interval
+        if lag <= 0:
+            continue
+        stats.loop_blocked_seconds += lag
+        stats.loop_max_lag = max(stats.loop_max_lag, lag)
+        if lag >= LOOP_LAG_WARN_SECONDS:
+            logger.warning("Boucle asyncio bloquée pendant %.0f ms", lag * 1000)
+
+
+def start_loop_monitor(loop: asyncio.AbstractEventLoop, interval: float = LOOP_LAG_INTERVAL) -> None:
+    """Measure how long the event loop stays blocked (scheduling lag of a periodic sleep)."""
+
+    global _monitor_task
+    if _monitor_task and not _monitor_task.done():
+        return
+    _monitor_task = loop.create_task(_monitor_loop_lag(interval))
+
+
+__all__ = ["DB_WORKERS", "run_blocking", "start_loop_monitor", "stats"]
@@ -17,11 +17,10 @@ import json
 import logging
 import os
 import random
-import re
+import time
 from collections import Counter, defaultdict
 from pathlib import Path
 from typing import Iterable, Optional, Tuple
-from urllib.parse import urlparse
 
 import discord
 from discord import app_commands
@@ -37,19 +36,50 @@ logging.getLogger("discord").setLevel(logging.WARNING)
 logging.getLogger("supabase").setLevel(logging.CRITICAL)
 logger = logging.getLogger(__name__)
 
-from database import db
+from database import async_db, db
 from database.batch_manager import (
     batch_logger,
+    register_shutdown_callback,
     register_signal_handlers,
     start_periodic_flush,
 )
+from database.worker_pool import start_loop_monitor, stats as db_pool_stats
 from database.models import Config
 from bot.anti_nuke import AntiNuke
 from bot.anti_raid import AntiRaid
 from bot.slow_mode import SlowModeManager
+from bot.level_curve import (
+    MAX_LEVEL,
+    MAX_XP,
+    xp_in_current_level as _xp_in_current_level,
+    xp_to_level as _xp_to_level,
+)
 from bot.level_roles import sync_level_roles
-from bot.card_generator import generate_levelup_card, generate_topxp_card, generate_xp_card, generate_roles_card
-from voice_xp import voice_xp_loop, get_daily_voice_xp, reset_daily_voice_xp, VOICE_DAILY_CAP
+from bot.blacklist_matcher import find_blacklisted
+from bot.expiring_map import ExpiringMap, pack_key
+from bot.link_scanner import scan as scan_links
+from bot.message_pipeline import ConcurrentStage, MessagePipeline, Stage, OVERFLOW_DEGRADE, OVERFLOW_WAIT
+from bot import state_snapshot
+from bot.card_generator import (
+    avatar_cache_stats,
+    card_cache_stats,
+    close_http_session,
+    generate_levelup_card,
+    generate_roles_card,
+    generate_topxp_card,
+    generate_xp_card,
+    render_stats as card_render_stats,
+    shutdown_render_pool,
+    start_render_pool,
+)
+from voice_xp import (
+    voice_xp_loop,
+    get_daily_voice_xp,
+    reset_daily_voice_xp,
+    export_daily_voice_xp,
+    restore_daily_voice_xp,
+    VOICE_DAILY_CAP,
+)
 
 _topxp_cache: dict = {}
 _topxp_data_cache: dict = {}
@@ -63,23 +93,33 @@ intents.members = True
 intents.messages = True
 intents.reactions = True
 
-bot = commands.Bot(command_prefix=commands.when_mentioned_or('!', 'e!'), intents=intents, help_command=None)
+COMMAND_PREFIXES = ('!', 'e!')
+bot = commands.Bot(command_prefix=commands.when_mentioned_or(*COMMAND_PREFIXES), intents=intents, help_command=None)
 bot.trap_words: dict[int, str] = {}
 bot.blacklist_words: dict[int, set[str]] = {}
+_bot_close = bot.close
+
+
+async def _close_bot() -> None:
+    """Fermeture du bot : pool de rendu et session HTTP des avatars, puis discord.py."""
+    shutdown_render_pool()
+    await close_http_session()
+    await _bot_close()
+
+
+bot.close = _close_bot
 
 XP_PER_MESSAGE = 5
 XP_PER_REACTION = 3
 XP_COOLDOWN_SECONDS = 30
 XP_REACT_COOLDOWN_SEC = 60
-MAX_LEVEL = 99
-XP_BASE_BY_LEVEL = 100
-XP_GROWTH_FACTOR = 1.12
 DAILY_XP_CAP = 3000
 DAILY_XP_THRESHOLD = 2000
 DAILY_XP_REDUCTION = 0.25
 
-_xp_last_gain_at: dict[tuple[int, int], datetime.datetime] = {}
-_xp_react_cooldown: dict[tuple[int, int, int], datetime.datetime] = {}
+# Cooldowns : clés = snowflakes concaténés (pack_key), purge automatique après le délai.
+_xp_last_gain_at = ExpiringMap(XP_COOLDOWN_SECONDS)
+_xp_react_cooldown = ExpiringMap(XP_REACT_COOLDOWN_SEC)
 
 # ── Système de quêtes journalières ──────────────────────────────────────────
 QUEST_MESSAGE_COOLDOWN_SECONDS = 20
@@ -107,7 +147,7 @@ QUEST_TYPE_EMOJIS = {"messages": "💬", "voice": "🎙️", "reactions": "❤
 
 # { guild_id: { user_id: {"date": "AAAA-MM-JJ", "quests": [ {...}, ... ]} } }
 _quest_state: dict[int, dict[int, dict]] = defaultdict(dict)
-_quest_msg_cooldown: dict[tuple[int, int], datetime.datetime] = {}
+_quest_msg_cooldown = ExpiringMap(QUEST_MESSAGE_COOLDOWN_SECONDS)
 
 # Le salon Discord où envoyer le message
 ROLE_CHANNEL_ID = 1267617798658457732
@@ -141,28 +181,12 @@ LEVEL_ROLES: dict[int, int] = {
 # Rôle exclusif au top 1 XP — mis à jour toutes les heures
 TOP1_XP_ROLE_ID = 1505229721825316915
 
-URL_REGEX = re.compile(r"(https?://[^\s]+|www\.[^\s]+)", re.IGNORECASE)
-DISCORD_INVITE_REGEX = re.compile(r"(?:https?://)?(?:www\.)?(?:discord\.gg|discord(?:app)?\.com/invite)/\S+", re.IGNORECASE)
-ALLOWED_VIDEO_DOMAINS = ("youtube.com", "youtu.be", "tiktok.com")
-ALLOWED_GIF_DOMAINS = (
-    "tenor.com",
-    "giphy.com",
-    "klipy.com",
-    "klipy.co",
-    "klipy.io",
-    "klipy.app",
-    "klipy.cloud",
-    "klipy-cdn.com",
-    "discordapp.com",
-    "discord.com",
-    "media.discordapp.net",
-    "cdn.discordapp.com",
-)
-
 start_time = datetime.datetime.utcnow()
 
 db.init_db()
+_config_version = db.get_config_version()
 config = db.load_config()
+CONFIG_POLL_INTERVAL = int(os.getenv("CONFIG_POLL_INTERVAL", "30"))
 
 slow_mode_manager = SlowModeManager(bot, config.to_dict())
 anti_nuke = AntiNuke(bot, config.to_dict())
@@ -179,9 +203,41 @@ def _ensure_background_tasks() -> None:
         return
     start_periodic_flush(bot.loop)
     register_signal_handlers(bot.loop)
+    start_loop_monitor(bot.loop)
+    message_pipeline.start()
+    bot.loop.create_task(watch_config_version())
+    register_shutdown_callback(_save_hot_state_now)
+    register_shutdown_callback(shutdown_render_pool)
     _background_tasks_started = True
 
 
+def _apply_config(new_config: Config) -> None:
+    """Recompile les politiques de chaque gestionnaire (remplacement atomique)."""
+    global config
+    config = new_config
+    data = new_config.to_dict()
+    slow_mode_manager.update_config(data)
+    anti_nuke.update_config(data)
+    anti_raid.update_config(data)
+
+
+async def watch_config_version():
+    """Recharge la configuration uniquement quand sa version stockée change."""
+    global _config_version
+    while True:
+        await asyncio.sleep(CONFIG_POLL_INTERVAL)
+        try:
+            version = await async_db.get_config_version()
+            if version is None or version == _config_version:
+                continue
+            db.invalidate_trust_levels()
+            _apply_config(await async_db.load_config())
+            _config_version = version
+            logger.info("Configuration rechargée (version %s).", version)
+        except Exception as exc:
+            logger.error("Erreur dans watch_config_version: %s", exc)
+
+
 def _get_roles_view() -> "RoleButtonsView":
     global _roles_view
     if _roles_view is None:
@@ -197,27 +253,24 @@ def uptime() -> str:
     return f"{int(days)}d {int(hours)}h {int(minutes)}m"
 
 
-def _is_privileged_member(member: discord.Member) -> bool:
-    permissions = member.guild_permissions
-    return permissions.administrator or permissions.manage_guild
+# { guild_id: { user_id: privilégié } } — invalidé par les événements membre / rôle / serveur
+_privilege_cache: defaultdict[int, dict[int, bool]] = defaultdict(dict)
 
 
-def _extract_blocked_links(content: str) -> list[str]:
-    return [url for url in URL_REGEX.findall(content) if not _is_allowed_link(url)]
+def _is_privileged_member(member: discord.Member) -> bool:
+    guild_cache = _privilege_cache[member.guild.id]
+    privileged = guild_cache.get(member.id)
+    if privileged is None:
+        permissions = member.guild_permissions
+        privileged = guild_cache[member.id] = permissions.administrator or permissions.manage_guild
+    return privileged
 
 
-def _is_allowed_link(url: str) -> bool:
-    normalized = url.lower().strip("()[]<>.,!?\"'")
-    if not normalized.startswith(("http://", "https://")):
-        normalized = f"https://{normalized}"
-    parsed = urlparse(normalized)
-    host = (parsed.hostname or "").lower()
-    path = (parsed.path or "").lower()
-    if path.endswith((".gif", ".gifv")):
-        return True
-    if any(host == d or host.endswith(f".{d}") for d in ALLOWED_GIF_DOMAINS):
-        return True
-    return any(host == d or host.endswith(f".{d}") for d in ALLOWED_VIDEO_DOMAINS)
+def _forget_privileges(guild_id: int, user_id: Optional[int] = None) -> None:
+    if user_id is None:
+        _privilege_cache.pop(guild_id, None)
+    elif guild_id in _privilege_cache:
+        _privilege_cache[guild_id].pop(user_id, None)
 
 
 async def reset_daily_xp():
@@ -245,7 +298,7 @@ async def update_top1_xp_role():
                 if role is None:
                     continue
 
-                top = db.get_top_xp(str(guild.id), limit=1)
+                top = await async_db.get_top_xp(str(guild.id), limit=1)
                 if not top:
                     continue
 
@@ -295,7 +348,7 @@ async def update_topxp_cache():
         try:
             for guild in bot.guilds:
                 guild_id = guild.id
-                data = db.get_top_xp(str(guild_id), limit=10)
+                data = await async_db.get_top_xp(str(guild_id), limit=10)
                 if not data:
                     continue
                 _topxp_data_cache[guild_id] = (data, datetime.datetime.utcnow())
@@ -313,7 +366,6 @@ async def update_topxp_cache():
                 card_buf, fname = await generate_topxp_card(
                     guild_name=guild.name,
                     entries=enriched,
-                    xp_to_level_fn=_xp_to_level,
                 )
                 if card_buf:
                     _topxp_cache[guild_id] = (card_buf, fname, datetime.datetime.utcnow())
@@ -325,41 +377,72 @@ async def update_topxp_cache():
         await asyncio.sleep(600)  # 10 minutes
 
 
-def _xp_required_for_next_level(level: int) -> int:
-    if level < 0:
-        return XP_BASE_BY_LEVEL
-    return int(XP_BASE_BY_LEVEL * (XP_GROWTH_FACTOR ** level))
-
-
-def _xp_total_for_level(level: int) -> int:
-    if level <= 0:
-        return 0
-    total = 0
-    for lvl in range(level):
-        total += _xp_required_for_next_level(lvl)
-    return total
+def _export_hot_state() -> dict:
+    """État chaud à conserver entre deux déploiements (caps, quêtes, cooldowns, caches /topxp)."""
+    return {
+        "date": datetime.datetime.utcnow().date().isoformat(),
+        "daily_xp": {guild_id: dict(users) for guild_id, users in _daily_xp.items()},
+        "daily_voice_xp": export_daily_voice_xp(),
+        "quest_state": {guild_id: dict(users) for guild_id, users in _quest_state.items()},
+        "saved_at": time.time(),
+        "xp_last_gain_at": _xp_last_gain_at.export_ages(),
+        "topxp_cache": {
+            guild_id: (buf.getvalue(), fname, generated_at)
+            for guild_id, (buf, fname, generated_at) in _topxp_cache.items()
+        },
+        "topxp_data_cache": dict(_topxp_data_cache),
+    }
+
+
+def _restore_hot_state(state: dict) -> None:
+    elapsed_ms = int(max(0.0, time.time() - state.get("saved_at", time.time())) * 1000)
+    _xp_last_gain_at.restore_ages(state.get("xp_last_gain_at") or {}, elapsed_ms)
+    _topxp_data_cache.update(state.get("topxp_data_cache") or {})
+    for guild_id, (raw, fname, generated_at) in (state.get("topxp_cache") or {}).items():
+        _topxp_cache[guild_id] = (io.BytesIO(raw), fname, generated_at)
+
+    # Les plafonds et quêtes journaliers ne valent que pour le jour de l'instantané.
+    if state.get("date") != datetime.datetime.utcnow().date().isoformat():
+        logger.info("Instantané du %s : compteurs journaliers ignorés.", state.get("date"))
+        return
+    for guild_id, users in (state.get("daily_xp") or {}).items():
+        _daily_xp[guild_id].update(users)
+    restore_daily_voice_xp(state.get("daily_voice_xp") or {})
+    for guild_id, users in (state.get("quest_state") or {}).items():
+        _quest_state[guild_id].update(users)
 
 
-MAX_XP = _xp_total_for_level(MAX_LEVEL)
+def _cooldown_stats() -> dict[str, dict[str, int]]:
+    return {
+        "xp_message": _xp_last_gain_at.stats(),
+        "xp_reaction": _xp_react_cooldown.stats(),
+        "quest_message": _quest_msg_cooldown.stats(),
+    }
 
 
-def _xp_to_level(xp: int) -> int:
-    if xp <= 0:
-        return 0
-    level = 0
-    while level < MAX_LEVEL and xp >= _xp_total_for_level(level + 1):
-        level += 1
-    return level
+def _save_hot_state_now() -> None:
+    state_snapshot.save(_export_hot_state())
 
 
-def _xp_in_current_level(xp: int) -> tuple[int, int]:
-    level = _xp_to_level(xp)
-    if level >= MAX_LEVEL:
-        req = _xp_required_for_next_level(MAX_LEVEL - 1)
-        return req, req
-    base = _xp_total_for_level(level)
-    required = _xp_required_for_next_level(level)
-    return max(0, xp - base), required
+async def snapshot_hot_state_loop():
+    """Écrit périodiquement l'instantané de l'état chaud sur le volume persistant."""
+    while True:
+        await asyncio.sleep(state_snapshot.SNAPSHOT_INTERVAL)
+        try:
+            started = time.perf_counter()
+            # Sérialisation sur la boucle (état cohérent), compression + écriture hors boucle.
+            payload = state_snapshot.encode(_export_hot_state())
+            await asyncio.to_thread(state_snapshot.write, payload, started=started)
+            logger.info("Cooldowns en mémoire : %s", _cooldown_stats())
+            logger.info("Pipeline messages : %s", message_pipeline.stats())
+            logger.info("Slow mode (mémoire) : %s", slow_mode_manager.memory_stats())
+            logger.info("Anti-nuke : %s", anti_nuke.stats())
+            logger.info("Rendu des cartes : %s", card_render_stats())
+            logger.info("Cache des cartes XP : %s", card_cache_stats())
+            logger.info("Cache des avatars : %s", avatar_cache_stats())
+            logger.info("Pool DB et boucle asyncio : %s", db_pool_stats.to_dict())
+        except Exception as exc:
+            logger.error("Erreur dans snapshot_hot_state_loop: %s", exc)
 
 
 def _build_progress_bar(progress: int, required: int, size: int = 12) -> str:
@@ -445,16 +528,10 @@ async def _sync_level_roles_hardcoded(member: discord.Member, new_level: int) ->
     return granted_role
 
 
-def _get_user_rank(guild_id: int, user_id: int) -> tuple[Optional[int], Optional[int]]:
-    """Retourne (rang, total) pour un utilisateur dans le classement XP."""
+async def _get_user_rank(guild_id: int, user_id: int) -> tuple[Optional[int], Optional[int]]:
+    """Retourne (rang, total) pour un utilisateur dans le classement XP (index en mémoire)."""
     try:
-        top = db.get_top_xp(str(guild_id), limit=1000)
-        user_id_str = str(user_id)
-        for idx, entry in enumerate(top, start=1):
-            if str(entry.get("user_id")) == user_id_str:
-                return idx, len(top)
-        # Pas dans le top 1000, on retourne quand même le total
-        return None, len(top)
+        return await db.xp_ledger.rank(str(guild_id), str(user_id))
     except Exception:
         return None, None
 
@@ -500,14 +577,12 @@ async def _grant_quest_reward(
     try:
         guild_id_str = str(member.guild.id)
         user_id_str = str(member.id)
-        current = db.get_user_xp(guild_id_str, user_id_str)
-        current_xp = int(current.get('xp', 0) or 0)
-        if current_xp >= MAX_XP:
+        current = await db.xp_ledger.get(guild_id_str, user_id_str)
+        if current['xp'] >= MAX_XP:
             return
 
+        current_xp, new_xp = await db.xp_ledger.add(guild_id_str, user_id_str, str(member), quest["reward"], MAX_XP)
         old_level = _xp_to_level(current_xp)
-        new_xp = min(MAX_XP, current_xp + quest["reward"])
-        db.set_user_xp(guild_id_str, user_id_str, str(member), new_xp)
 
         try:
             await channel.send(
@@ -549,10 +624,8 @@ async def _progress_quest(
 async def _grant_message_xp(message: discord.Message) -> None:
     if message.guild is None:
         return
-    key = (message.guild.id, message.author.id)
-    now = datetime.datetime.utcnow()
-    last = _xp_last_gain_at.get(key)
-    if last and (now - last).total_seconds() < XP_COOLDOWN_SECONDS:
+    key = pack_key(message.guild.id, message.author.id)
+    if _xp_last_gain_at.active(key):
         return
 
     guild_id = message.guild.id
@@ -561,22 +634,20 @@ async def _grant_message_xp(message: discord.Message) -> None:
 
     actual_xp = _add_daily_xp(guild_id, user_id, base_xp)
     if actual_xp <= 0:
-        _xp_last_gain_at[key] = now
+        _xp_last_gain_at.touch(key)
         return
 
     guild_id_str = str(guild_id)
     user_id_str = str(user_id)
-    current = db.get_user_xp(guild_id_str, user_id_str)
-    current_xp = int(current.get('xp', 0) or 0)
+    current = await db.xp_ledger.get(guild_id_str, user_id_str)
 
-    if current_xp >= MAX_XP:
-        _xp_last_gain_at[key] = now
+    if current['xp'] >= MAX_XP:
+        _xp_last_gain_at.touch(key)
         return
 
+    current_xp, new_xp = await db.xp_ledger.add(guild_id_str, user_id_str, str(message.author), actual_xp, MAX_XP)
     old_level = _xp_to_level(current_xp)
-    new_xp = min(MAX_XP, current_xp + actual_xp)
-    db.set_user_xp(guild_id_str, user_id_str, str(message.author), new_xp)
-    _xp_last_gain_at[key] = now
+    _xp_last_gain_at.touch(key)
 
     new_level = _xp_to_level(new_xp)
     if new_level > old_level:
@@ -595,12 +666,10 @@ async def _track_quest_message(message: discord.Message) -> None:
     if message.author.bot:
         return
 
-    key = (message.guild.id, message.author.id)
-    now = datetime.datetime.utcnow()
-    last = _quest_msg_cooldown.get(key)
-    if last and (now - last).total_seconds() < QUEST_MESSAGE_COOLDOWN_SECONDS:
+    key = pack_key(message.guild.id, message.author.id)
+    if _quest_msg_cooldown.active(key):
         return
-    _quest_msg_cooldown[key] = now
+    _quest_msg_cooldown.touch(key)
 
     await _progress_quest(message.channel, message.author, "messages", 1)
 
@@ -618,18 +687,12 @@ async def _grant_reaction_xp(reaction: discord.Reaction, reactor: discord.Member
         return
 
     guild_id = message.guild.id
-    now = datetime.datetime.utcnow()
-    ck = (guild_id, reactor.id, author.id)
-    last = _xp_react_cooldown.get(ck)
-    if last and (now - last).total_seconds() < XP_REACT_COOLDOWN_SEC:
+    ck = pack_key(guild_id, reactor.id, author.id)
+    if _xp_react_cooldown.active(ck):
         return
-    _xp_react_cooldown[ck] = now
+    _xp_react_cooldown.touch(ck)
 
-    try:
-        current = _get_reaction_count(guild_id, author.id)
-        _increment_reaction_count(guild_id, author.id, str(author), current + 1)
-    except Exception:
-        pass
+    db.reaction_counter.increment(str(guild_id), str(author.id), str(author))
 
     await _progress_quest(message.channel, author, "reactions", 1)
 
@@ -640,15 +703,13 @@ async def _grant_reaction_xp(reaction: discord.Reaction, reactor: discord.Member
 
     guild_id_str = str(guild_id)
     user_id_str = str(author.id)
-    current = db.get_user_xp(guild_id_str, user_id_str)
-    current_xp = int(current.get('xp', 0) or 0)
+    current = await db.xp_ledger.get(guild_id_str, user_id_str)
 
-    if current_xp >= MAX_XP:
+    if current['xp'] >= MAX_XP:
         return
 
+    current_xp, new_xp = await db.xp_ledger.add(guild_id_str, user_id_str, str(author), actual_xp, MAX_XP)
     old_level = _xp_to_level(current_xp)
-    new_xp = min(MAX_XP, current_xp + actual_xp)
-    db.set_user_xp(guild_id_str, user_id_str, str(author), new_xp)
 
     new_level = _xp_to_level(new_xp)
     if new_level > old_level:
@@ -711,59 +772,6 @@ def _schedule_message_deletion(message: Optional[discord.Message], delay: float)
     asyncio.create_task(_delete_later())
 
 
-def _get_reaction_count(guild_id: int, user_id: int) -> int:
-    client = db._ensure_client()
-    if not client:
-        return 0
-    try:
-        resp = (
-            client.table("reaction_counts")
-            .select("count")
-            .eq("guild_id", str(guild_id))
-            .eq("user_id", str(user_id))
-            .limit(1)
-            .execute()
-        )
-        return int(resp.data[0].get("count") or 0) if resp.data else 0
-    except Exception:
-        return 0
-
-
-def _increment_reaction_count(guild_id: int, user_id: int, user_name: str, count: int) -> None:
-    client = db._ensure_client()
-    if not client:
-        return
-    try:
-        client.table("reaction_counts").upsert(
-            {
-                "guild_id": str(guild_id),
-                "user_id": str(user_id),
-                "user_name": user_name,
-                "count": count,
-            },
-            on_conflict="guild_id,user_id",
-        ).execute()
-    except Exception:
-        pass
-
-
-def _get_top_reactions(guild_id: int, limit: int = 10) -> list[dict]:
-    client = db._ensure_client()
-    if not client:
-        return []
-    try:
-        resp = (
-            client.table("reaction_counts")
-            .select("user_id,user_name,count")
-            .eq("guild_id", str(guild_id))
-            .order("count", desc=True)
-            .limit(limit)
-            .execute()
-        )
-        return resp.data or []
-    except Exception:
-        return []
-
 async def _send_ephemeral(interaction: discord.Interaction, content: str) -> None:
     if interaction.response.is_done():
         await interaction.followup.send(content, ephemeral=True)
@@ -955,7 +963,7 @@ async def _get_cached_topxp_data(guild_id: int) -> Optional[list]:
     if cached and (now - cached[1]).total_seconds() < 600:
         return cached[0]
     try:
-        data = db.get_top_xp(str(guild_id), limit=10)
+        data = await async_db.get_top_xp(str(guild_id), limit=10)
         _topxp_data_cache[guild_id] = (data, now)
         return data
     except Exception:
@@ -998,7 +1006,6 @@ async def topxp_slash(interaction: discord.Interaction):
         card_buf, fname = await generate_topxp_card(
             guild_name=interaction.guild.name,
             entries=enriched,
-            xp_to_level_fn=_xp_to_level,
         )
 
         if card_buf:
@@ -1039,11 +1046,7 @@ async def addxp(interaction: discord.Interaction, user: discord.Member, amount:
     user_id_str = str(user_id)
 
     try:
-        current = db.get_user_xp(guild_id_str, user_id_str)
-        current_xp = int(current.get('xp', 0) or 0)
-        new_xp = min(MAX_XP, current_xp + amount)
-
-        db.set_user_xp(guild_id_str, user_id_str, str(user), new_xp)
+        current_xp, new_xp = await db.xp_ledger.add(guild_id_str, user_id_str, str(user), amount, MAX_XP)
 
         new_level = _xp_to_level(new_xp)
         old_level = _xp_to_level(current_xp)
@@ -1074,11 +1077,7 @@ async def removexp(interaction: discord.Interaction, user: discord.Member, amoun
     user_id_str = str(user_id)
 
     try:
-        current = db.get_user_xp(guild_id_str, user_id_str)
-        current_xp = int(current.get('xp', 0) or 0)
-        new_xp = max(0, current_xp - amount)
-
-        db.set_user_xp(guild_id_str, user_id_str, str(user), new_xp)
+        current_xp, new_xp = await db.xp_ledger.add(guild_id_str, user_id_str, str(user), -amount)
 
         old_level = _xp_to_level(current_xp)
         new_level = _xp_to_level(new_xp)
@@ -1121,7 +1120,7 @@ class ResetXPConfirmView(discord.ui.View):
             child.disabled = True
 
         try:
-            removed = db.reset_guild_xp(self.guild_id)
+            removed = await db.xp_ledger.reset_guild(self.guild_id)
             _daily_xp.pop(interaction.guild.id, None)
             await interaction.response.edit_message(
                 content=f"✅ XP réinitialisée pour tout le serveur ({removed} membre(s) concerné(s)).",
@@ -1164,7 +1163,8 @@ async def on_ready():
     bot.loop.create_task(reset_daily_xp())
     bot.loop.create_task(update_top1_xp_role())
     bot.loop.create_task(update_topxp_cache())
-    bot.loop.create_task(voice_xp_loop(bot, db, _xp_to_level, _handle_level_up, MAX_XP, _quest_voice_tick))
+    bot.loop.create_task(snapshot_hot_state_loop())
+    bot.loop.create_task(voice_xp_loop(bot, db, _handle_level_up, _quest_voice_tick))
 
     # Correction de la boucle for (Ligne 965 qui bloquait tout)
     for guild in bot.guilds:
@@ -1194,6 +1194,59 @@ async def on_ready():
         pass
 
 
+def _looks_like_command(message: discord.Message) -> bool:
+    content = message.content
+    if content.startswith(COMMAND_PREFIXES):
+        return True
+    return bot.user is not None and content.startswith((f"<@{bot.user.id}>", f"<@!{bot.user.id}>"))
+
+
+def _message_log_payload(message: discord.Message) -> dict:
+    return {
+        'type': 'message', 'level': 'info', 'message': 'Message reçu',
+        'user_id': str(message.author.id), 'user_name': str(message.author),
+        'channel_id': str(message.channel.id), 'guild_id': str(message.guild.id),
+        'channel_name': message.channel.name, 'metadata': {},
+    }
+
+
+async def _process_message_activity(message: discord.Message) -> None:
+    await _grant_message_xp(message)
+    await _track_quest_message(message)
+    try:
+        await batch_logger.log(_message_log_payload(message))
+    except Exception:
+        pass
+
+
+def _degrade_message_activity(message: discord.Message) -> None:
+    """File d'activité saturée : on garde le log du message, sans XP ni quête."""
+    batch_logger.log_nowait(_message_log_payload(message))
+
+
+MESSAGE_PIPELINE_SHARDS = int(os.getenv("MESSAGE_PIPELINE_SHARDS", "4"))
+MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", "500"))
+COMMAND_CONCURRENCY = int(os.getenv("COMMAND_CONCURRENCY", "32"))
+
+message_pipeline = MessagePipeline(
+    commands=ConcurrentStage(
+        "commands",
+        bot.process_commands,
+        limit=COMMAND_CONCURRENCY,
+        maxsize=MESSAGE_QUEUE_SIZE,
+        overflow=OVERFLOW_WAIT,
+    ),
+    activity=Stage(
+        "activity",
+        _process_message_activity,
+        shards=MESSAGE_PIPELINE_SHARDS,
+        maxsize=MESSAGE_QUEUE_SIZE,
+        overflow=OVERFLOW_DEGRADE,
+        degrade=_degrade_message_activity,
+    ),
+)
+
+
 @bot.event
 async def on_message(message: discord.Message):
     if message.author.bot:
@@ -1203,12 +1256,11 @@ async def on_message(message: discord.Message):
         return
     if isinstance(message.author, discord.Member) and not _is_privileged_member(message.author):
         lowered_content = message.content.lower()
-        blocked_links = _extract_blocked_links(message.content)
-        contains_invite = bool(DISCORD_INVITE_REGEX.search(lowered_content))
-        blacklist_words = bot.blacklist_words.get(guild.id, set())
-        contains_blacklisted = any(word in lowered_content for word in blacklist_words)
+        links = scan_links(message.content)
+        blacklisted_term = find_blacklisted(guild.id, bot.blacklist_words.get(guild.id, ()), lowered_content)
+        contains_blacklisted = blacklisted_term is not None
 
-        if blocked_links or contains_invite or contains_blacklisted:
+        if links.blocked or contains_blacklisted:
             try:
                 await message.delete()
             except (discord.Forbidden, discord.HTTPException):
@@ -1235,22 +1287,12 @@ async def on_message(message: discord.Message):
                     'moderation', 'info', 'Message supprimé automatiquement',
                     user_id=str(message.author.id), user_name=str(message.author),
                     channel_id=str(message.channel.id), guild_id=str(guild.id),
+                    matched_term=blacklisted_term,
                 )
                 return
 
-    await _grant_message_xp(message)
-    await _track_quest_message(message)
-    await bot.process_commands(message)
-    try:
-        await batch_logger.log({
-            'type': 'message', 'level': 'info', 'message': 'Message reçu',
-            'user_id': str(message.author.id), 'user_name': str(message.author),
-            'channel_id': str(message.channel.id), 'guild_id': str(guild.id),
-            'channel_name': message.channel.name, 'metadata': {},
-        })
-    except Exception:
-        pass
     slow_mode_manager.handle_message(message)
+    await message_pipeline.dispatch(message, _looks_like_command(message))
 
     trap_word = bot.trap_words.get(guild.id)
     if trap_word and trap_word in message.content.lower():
@@ -1281,13 +1323,20 @@ async def on_member_join(member: discord.Member):
     try:
         db.log_event('member', 'info', 'Nouveau membre',
                      user_id=str(member.id), user_name=str(member), guild_id=str(member.guild.id))
-        anti_raid.handle_member_join(member)
+        await anti_raid.handle_member_join(member)
     except Exception:
         pass
 
 
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+        _forget_privileges(after.guild.id, after.id)
+
+
 @bot.event
 async def on_member_remove(member: discord.Member):
+    _forget_privileges(member.guild.id, member.id)
     try:
         db.log_event('member', 'info', 'Membre parti',
                      user_id=str(member.id), user_name=str(member), guild_id=str(member.guild.id))
@@ -1303,18 +1352,36 @@ async def on_guild_channel_delete(channel):
         pass
 
 
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    if before.permissions != after.permissions:
+        _forget_privileges(after.guild.id)
+
+
+@bot.event
+async def on_guild_update(before: discord.Guild, after: discord.Guild):
+    if before.owner_id != after.owner_id:
+        _forget_privileges(after.id)
+
+
 @bot.event
 async def on_guild_role_delete(role):
+    _forget_privileges(role.guild.id)
     try:
         await anti_nuke.handle_role_delete(role)
     except Exception:
         pass
 
 
+@bot.event
+async def on_audit_log_entry_create(entry: discord.AuditLogEntry):
+    anti_nuke.record_audit_entry(entry)
+
+
 @bot.event
 async def on_member_ban(guild, user):
     try:
-        await anti_nuke.handle_ban(guild)
+        await anti_nuke.handle_ban(guild, user)
     except Exception:
         pass
 
@@ -1360,7 +1427,7 @@ async def sync_roles_cmd(ctx: commands.Context):
     for member in ctx.guild.members:
         if member.bot:
             continue
-        entry = db.get_user_xp(str(ctx.guild.id), str(member.id))
+        entry = await db.xp_ledger.get(str(ctx.guild.id), str(member.id))
         xp_value = int(entry.get('xp', 0) or 0)
         cur_level = _xp_to_level(xp_value)
         await _sync_level_roles_hardcoded(member, cur_level)
@@ -1428,12 +1495,12 @@ async def xp_command_prefix(ctx: commands.Context, member: Optional[discord.Memb
         return
 
     target = member or ctx.author
-    entry = db.get_user_xp(str(ctx.guild.id), str(target.id))
+    entry = await db.xp_ledger.get(str(ctx.guild.id), str(target.id))
     xp_value = int(entry.get('xp', 0) or 0)
     level = _xp_to_level(xp_value)
     progress, required = _xp_in_current_level(xp_value)
 
-    rank, total_members = _get_user_rank(ctx.guild.id, target.id)
+    rank, total_members = await _get_user_rank(ctx.guild.id, target.id)
     daily_xp = _get_daily_xp(ctx.guild.id, target.id)
 
     try:
@@ -1507,8 +1574,7 @@ async def reactlb(ctx: commands.Context):
         await ctx.send('Cette commande doit être utilisée sur un serveur.')
         return
 
-    loop = asyncio.get_event_loop()
-    entries = await loop.run_in_executor(None, lambda: _get_top_reactions(ctx.guild.id))
+    entries = await db.reaction_counter.top(str(ctx.guild.id))
     if not entries:
         await ctx.send("Aucune réaction enregistrée pour le moment.")
         return
@@ -1657,12 +1723,12 @@ async def xp_slash(interaction: discord.Interaction, membre: Optional[discord.Me
     await interaction.response.defer()
 
     target = membre or interaction.user
-    entry = db.get_user_xp(str(interaction.guild.id), str(target.id))
+    entry = await db.xp_ledger.get(str(interaction.guild.id), str(target.id))
     xp_value = int(entry.get('xp', 0) or 0)
     level = _xp_to_level(xp_value)
     progress, required = _xp_in_current_level(xp_value)
 
-    rank, total_members = _get_user_rank(interaction.guild.id, target.id)
+    rank, total_members = await _get_user_rank(interaction.guild.id, target.id)
     daily_xp = _get_daily_xp(interaction.guild.id, target.id)
 
     try:
@@ -1702,6 +1768,11 @@ def run_bot():
     if not token:
         logger.error('ERREUR: Token Discord non trouvé!')
         return
+    state = state_snapshot.load()
+    if state:
+        _restore_hot_state(state)
+    # Avant bot.run : les workers de rendu sont créés tant que le processus n'a pas de threads actifs.
+    start_render_pool()
     bot.run(token)
 
 
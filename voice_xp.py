@@ -13,12 +13,15 @@ voice_xp.py — Système d'XP vocal
 import asyncio
 import datetime
 import logging
+import time
 from collections import defaultdict
 from typing import Callable, Optional
 
 import discord
 from discord.ext import commands
 
+from bot.level_curve import MAX_XP, xp_to_level
+
 logger = logging.getLogger(__name__)
 
 # ── Constantes ────────────────────────────────────────────────────────────────
@@ -49,6 +52,17 @@ def reset_daily_voice_xp() -> None:
     logger.info("Reset quotidien des XP vocaux effectué.")
 
 
+def export_daily_voice_xp() -> dict[int, dict[int, int]]:
+    """Copie des compteurs vocaux du jour (pour l'instantané de redémarrage)."""
+    return {guild_id: dict(users) for guild_id, users in _daily_voice_xp.items()}
+
+
+def restore_daily_voice_xp(data: dict[int, dict[int, int]]) -> None:
+    """Recharge des compteurs vocaux issus d'un instantané du même jour."""
+    for guild_id, users in data.items():
+        _daily_voice_xp[guild_id].update(users)
+
+
 def _add_daily_voice_xp(guild_id: int, user_id: int, amount: int) -> int:
     """
     Ajoute `amount` XP vocal en respectant le plafond et les diminishing returns.
@@ -83,12 +97,18 @@ def _add_daily_voice_xp(guild_id: int, user_id: int, amount: int) -> int:
 
 # ── Condition d'éligibilité ───────────────────────────────────────────────────
 
-def _is_eligible(member: discord.Member, channel: discord.VoiceChannel) -> bool:
+def _is_eligible(
+    member: discord.Member,
+    channel: discord.VoiceChannel,
+    human_count: Optional[int] = None,
+) -> bool:
     """
     Un membre gagne de l'XP vocal si :
     - Il est dans un salon non exclu
     - Il n'est pas muté (self_mute) ni sourd (self_deaf)
     - Le salon contient au moins 2 membres humains non-bots
+
+    `human_count` peut être précalculé par salon pour éviter un recomptage par membre.
     """
     if channel.id in EXCLUDED_CHANNEL_IDS:
         return False
@@ -100,26 +120,110 @@ def _is_eligible(member: discord.Member, channel: discord.VoiceChannel) -> bool:
         return False
 
     # Compte les membres humains présents (hors bots, hors AFK)
-    human_count = sum(
-        1 for m in channel.members
-        if not m.bot
-    )
+    if human_count is None:
+        human_count = sum(
+            1 for m in channel.members
+            if not m.bot
+        )
     return human_count >= 2
 
 
 # ── Tâche de fond principale ──────────────────────────────────────────────────
 
+# Statistiques du dernier tick (durée, membres éligibles, gains accordés)
+last_tick_stats: dict[str, float] = {"duration_ms": 0.0, "members": 0, "grants": 0, "level_ups": 0}
+
+
+async def _run_tick(
+    bot: commands.Bot,
+    db,
+    handle_level_up_fn,
+    quest_tick_fn: Optional[Callable],
+) -> None:
+    """
+    Un tick : collecte d'abord tous les gains éligibles, puis par guild une
+    lecture groupée + application en mémoire via le ledger XP (écrit en lot au
+    prochain flush), et enfin les quêtes et level-ups.
+    """
+    started = time.perf_counter()
+    grants_count = 0
+    level_ups: list[tuple[discord.VoiceChannel, discord.Member, int, int, int]] = []
+    ticked: list[tuple[discord.VoiceChannel, discord.Member]] = []
+
+    for guild in bot.guilds:
+        grants: list[tuple[discord.VoiceChannel, discord.Member, int]] = []
+        for channel in guild.voice_channels:
+            if channel.id in EXCLUDED_CHANNEL_IDS:
+                continue
+            human_count = sum(1 for m in channel.members if not m.bot)
+            if human_count < 2:
+                continue
+
+            for member in channel.members:
+                if member.bot:
+                    continue
+                if not _is_eligible(member, channel, human_count):
+                    continue
+                ticked.append((channel, member))
+                actual_xp = _add_daily_voice_xp(guild.id, member.id, VOICE_XP_PER_MINUTE)
+                if actual_xp > 0:
+                    grants.append((channel, member, actual_xp))
+
+        if not grants:
+            continue
+        grants_count += len(grants)
+        try:
+            results = await db.xp_ledger.add_many(
+                str(guild.id),
+                [(str(member.id), str(member), amount) for _, member, amount in grants],
+                MAX_XP,
+            )
+        except Exception as exc:
+            logger.error("Erreur XP vocal dans %s : %s", guild.name, exc)
+            continue
+        for (channel, member, _), (old_xp, new_xp) in zip(grants, results):
+            old_level = xp_to_level(old_xp)
+            new_level = xp_to_level(new_xp)
+            if new_level > old_level:
+                level_ups.append((channel, member, old_level, new_level, new_xp))
+
+    members_count = len(ticked)
+    if quest_tick_fn is not None:
+        for channel, member in ticked:
+            try:
+                await quest_tick_fn(channel, member)
+            except Exception:
+                logger.exception("Erreur dans quest_tick_fn pour %s", member)
+
+    for channel, member, old_level, new_level, new_xp in level_ups:
+        try:
+            await handle_level_up_fn(channel, member, old_level, new_level, new_xp)
+        except Exception as exc:
+            logger.error("Erreur level up vocal pour %s : %s", member, exc)
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    last_tick_stats.update(
+        duration_ms=round(duration_ms, 1),
+        members=members_count,
+        grants=grants_count,
+        level_ups=len(level_ups),
+    )
+    if members_count:
+        logger.info(
+            "Tick XP vocal : %d membre(s) éligible(s), %d gain(s), %d level up(s) en %.0f ms",
+            members_count, grants_count, len(level_ups), duration_ms,
+        )
+
+
 async def voice_xp_loop(
     bot: commands.Bot,
     db,
-    xp_to_level_fn,
     handle_level_up_fn,
-    max_xp: int,
     quest_tick_fn: Optional[Callable] = None,
 ) -> None:
     """
     Tâche asyncio à lancer dans on_ready :
-        bot.loop.create_task(voice_xp_loop(bot, db, _xp_to_level, _handle_level_up, MAX_XP, _quest_voice_tick))
+        bot.loop.create_task(voice_xp_loop(bot, db, _handle_level_up, _quest_voice_tick))
 
     Toutes les 60 secondes, parcourt tous les salons vocaux de tous les guilds
     et accorde l'XP aux membres éligibles.
@@ -132,50 +236,7 @@ async def voice_xp_loop(
 
     while True:
         await asyncio.sleep(VOICE_XP_TICK_SECONDS)
-
-        for guild in bot.guilds:
-            for channel in guild.voice_channels:
-                if channel.id in EXCLUDED_CHANNEL_IDS:
-                    continue
-
-                for member in channel.members:
-                    if member.bot:
-                        continue
-                    if not _is_eligible(member, channel):
-                        continue
-
-                    guild_id = guild.id
-                    user_id = member.id
-                    guild_id_str = str(guild_id)
-                    user_id_str = str(user_id)
-
-                    if quest_tick_fn is not None:
-                        try:
-                            await quest_tick_fn(channel, member)
-                        except Exception:
-                            logger.exception("Erreur dans quest_tick_fn pour %s", member)
-
-                    actual_xp = _add_daily_voice_xp(guild_id, user_id, VOICE_XP_PER_MINUTE)
-                    if actual_xp <= 0:
-                        continue
-
-                    try:
-                        current = db.get_user_xp(guild_id_str, user_id_str)
-                        current_xp = int(current.get('xp', 0) or 0)
-
-                        if current_xp >= max_xp:
-                            continue
-
-                        old_level = xp_to_level_fn(current_xp)
-                        new_xp = min(max_xp, current_xp + actual_xp)
-                        db.set_user_xp(guild_id_str, user_id_str, str(member), new_xp)
-
-                        new_level = xp_to_level_fn(new_xp)
-                        if new_level > old_level:
-                            await handle_level_up_fn(channel, member, old_level, new_level, new_xp)
-
-                    except Exception as exc:
-                        logger.error(
-                            "Erreur XP vocal pour %s dans %s : %s",
-                            member, guild.name, exc
-                        )
+        try:
+            await _run_tick(bot, db, handle_level_up_fn, quest_tick_fn)
+        except Exception:
+            logger.exception("Erreur dans le tick XP vocal")